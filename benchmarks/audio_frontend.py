@@ -0,0 +1,294 @@
+"""
+Offline benchmark for the audio front end (VAD -> segmentation -> optional STT).
+
+Feeds WAV files, or generated speech/noise/silence mixes, through the same capture ring and
+`StreamingVAD` settings the mic listener uses, as fast as possible, and reports the real-time factor,
+CPU time per audio second, peak traced memory and garbage collections (memory churn) and
+segmentation accuracy against labeled speech timestamps.
+
+    python benchmarks/audio_frontend.py --synthetic 20
+    python benchmarks/audio_frontend.py --wav sample.wav --labels sample.json --stt whisper
+
+A labels file is a JSON list of {"start": seconds, "end": seconds, "text": optional transcript}.
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import soundfile as sf
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from silero_vad import load_silero_vad  # noqa: E402
+from vad import MIN_SEGMENT_ENERGY, VAD_SETTINGS, CaptureBuffer, StreamingVAD, segment_energy  # noqa: E402
+
+SAMPLE_RATE = 16000
+CHUNK_DURATION = 0.5
+
+PHRASES = [
+    "What is the weather like in Bangalore today",
+    "Add buy groceries to my to do list",
+    "Tell me the latest news about artificial intelligence",
+    "What time is it",
+    "Remind me what we talked about yesterday",
+    "Search the web for the best books on habits",
+]
+
+
+def load_wav(path: str) -> np.ndarray:
+    """
+    The function `load_wav` reads a WAV file as mono int16 at 16 kHz.
+
+    :param path: Path to the WAV file
+    :type path: str
+    :return: A 1-D int16 array
+    """
+    audio, rate = sf.read(path, dtype="float32", always_2d=True)
+    audio = audio.mean(axis=1)
+    if rate != SAMPLE_RATE:
+        positions = np.arange(0, len(audio), rate / SAMPLE_RATE)
+        audio = np.interp(positions, np.arange(len(audio)), audio)
+    return (np.clip(audio, -1, 1) * 32767).astype(np.int16)
+
+
+def render_phrases(phrases: list, cache_dir: str) -> list:
+    """
+    The function `render_phrases` renders speech clips with the local TTS engine and trims their
+    leading and trailing silence, so the clip boundaries are exact speech labels.
+
+    :param phrases: The phrases to render
+    :type phrases: list
+    :param cache_dir: Directory for the rendered WAV files
+    :type cache_dir: str
+    :return: A list of `(text, int16 audio)` tuples
+    """
+    import pyttsx3
+    engine = pyttsx3.init()
+    paths = []
+    for i, phrase in enumerate(phrases):
+        path = os.path.join(cache_dir, f"phrase_{i}.wav")
+        if not os.path.exists(path):
+            engine.save_to_file(phrase, path)
+        paths.append(path)
+    engine.runAndWait()
+
+    clips = []
+    for phrase, path in zip(phrases, paths):
+        audio = load_wav(path)
+        loud = np.flatnonzero(np.abs(audio.astype(np.int32)) > 500)
+        if len(loud):
+            clips.append((phrase, audio[loud[0]:loud[-1] + 1]))
+    return clips
+
+
+def synthesize_mix(clips: list, count: int, snr_db: float, seed: int) -> tuple:
+    """
+    The function `synthesize_mix` builds a stream of speech clips separated by silence and noise
+    gaps, with white noise added at the given signal-to-noise ratio.
+
+    :param clips: Speech clips from `render_phrases`
+    :type clips: list
+    :param count: How many utterances to place in the stream
+    :type count: int
+    :param snr_db: Signal-to-noise ratio of the background noise in dB
+    :type snr_db: float
+    :param seed: Random seed, so runs are comparable
+    :type seed: int
+    :return: A tuple `(int16 audio, labels)`
+    """
+    rng = np.random.default_rng(seed)
+    parts, labels, position = [], [], 0
+    for _ in range(count):
+        gap = int(rng.uniform(1.5, 4.0) * SAMPLE_RATE)
+        parts.append(np.zeros(gap, dtype=np.float32))
+        position += gap
+        text, clip = clips[rng.integers(len(clips))]
+        parts.append(clip.astype(np.float32))
+        labels.append({"start": position / SAMPLE_RATE, "end": (position + len(clip)) / SAMPLE_RATE, "text": text})
+        position += len(clip)
+    parts.append(np.zeros(2 * SAMPLE_RATE, dtype=np.float32))
+    audio = np.concatenate(parts)
+
+    speech_power = np.mean(np.concatenate([clip.astype(np.float32) for _, clip in clips]) ** 2)
+    noise = rng.normal(0, np.sqrt(speech_power / 10 ** (snr_db / 10)), len(audio))
+    return np.clip(audio + noise, -32768, 32767).astype(np.int16), labels
+
+
+def match_segments(predicted: list, labels: list, min_iou: float = 0.5) -> dict:
+    """
+    The function `match_segments` greedily pairs predicted and labeled segments by overlap and
+    computes precision, recall, F1 and the mean boundary errors of the matched pairs.
+
+    :param predicted: Predicted segments as `{"start", "end"}` in seconds
+    :type predicted: list
+    :param labels: Labeled segments as `{"start", "end"}` in seconds
+    :type labels: list
+    :param min_iou: Minimum intersection over union for a match
+    :type min_iou: float
+    :return: A dictionary with the accuracy figures
+    """
+    matched, start_errors, end_errors = set(), [], []
+    for label in labels:
+        best, best_iou = None, min_iou
+        for i, segment in enumerate(predicted):
+            if i in matched:
+                continue
+            overlap = min(label["end"], segment["end"]) - max(label["start"], segment["start"])
+            union = max(label["end"], segment["end"]) - min(label["start"], segment["start"])
+            if overlap > 0 and overlap / union >= best_iou:
+                best, best_iou = i, overlap / union
+        if best is not None:
+            matched.add(best)
+            start_errors.append(abs(predicted[best]["start"] - label["start"]))
+            end_errors.append(abs(predicted[best]["end"] - label["end"]))
+
+    precision = len(matched) / len(predicted) if predicted else 0.0
+    recall = len(matched) / len(labels) if labels else 0.0
+    return {
+        "precision": precision,
+        "recall": recall,
+        "f1": 2 * precision * recall / (precision + recall) if precision + recall else 0.0,
+        "start_error_ms": 1000 * float(np.mean(start_errors)) if start_errors else None,
+        "end_error_ms": 1000 * float(np.mean(end_errors)) if end_errors else None,
+    }
+
+
+def word_error_rate(reference: str, hypothesis: str) -> float:
+    ref, hyp = reference.lower().split(), hypothesis.lower().split()
+    distance = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        previous, distance[0] = distance[0], i
+        for j, hyp_word in enumerate(hyp, 1):
+            previous, distance[j] = distance[j], min(
+                distance[j] + 1, distance[j - 1] + 1, previous + (ref_word != hyp_word))
+    return distance[-1] / len(ref) if ref else 0.0
+
+
+def run_pipeline(audio: np.ndarray, model, backend=None) -> dict:
+    """
+    The function `run_pipeline` streams audio through the front end in mic-sized chunks, as fast as
+    possible, and measures it.
+
+    :param audio: A 1-D int16 array at 16 kHz
+    :type audio: np.ndarray
+    :param model: The Silero VAD model
+    :param backend: An optional STT backend from `stt.load_stt_backend`
+    :return: A dictionary with the segments and measurements
+    """
+    vad = StreamingVAD(model, sampling_rate=SAMPLE_RATE, **VAD_SETTINGS)
+    chunk = int(SAMPLE_RATE * CHUNK_DURATION)
+    capture = CaptureBuffer(4 * chunk)
+    blocks = audio.reshape(-1, 1)
+    segments, stt_seconds = [], 0.0
+
+    gc.collect()
+    collections_before = sum(stat["collections"] for stat in gc.get_stats())
+    tracemalloc.start()
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    for position in range(0, len(audio), chunk):
+        # Written the way the sounddevice callback writes, read back as views like the mic listener
+        capture.write(blocks[position:position + chunk])
+        segments_found = []
+        for view in capture.views(timeout=0):
+            segments_found += vad.process(view)
+            capture.release(len(view))
+        for segment in segments_found:
+            if segment_energy(segment["audio"]) <= MIN_SEGMENT_ENERGY:
+                continue
+            result = {"start": segment["start"] / SAMPLE_RATE, "end": segment["end"] / SAMPLE_RATE}
+            if backend is not None:
+                stt_start = time.perf_counter()
+                try:
+                    result["text"] = backend.transcribe(segment["audio"], SAMPLE_RATE)
+                except Exception:
+                    result["text"] = ""
+                stt_seconds += time.perf_counter() - stt_start
+            segments.append(result)
+    wall, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    audio_seconds = len(audio) / SAMPLE_RATE
+    return {
+        "segments": segments,
+        "audio_seconds": audio_seconds,
+        "rtf": wall / audio_seconds,
+        "cpu_per_audio_second": cpu / audio_seconds,
+        "stt_rtf": stt_seconds / audio_seconds,
+        "peak_traced_mb": peak / 2 ** 20,
+        "gc_collections": sum(stat["collections"] for stat in gc.get_stats()) - collections_before,
+    }
+
+
+def max_rss_mb() -> float:
+    try:
+        import resource
+    except ImportError:
+        return float("nan")
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 2 ** 20 if sys.platform == "darwin" else rss / 2 ** 10
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--wav", action="append", default=[], help="WAV file to run (repeatable)")
+    parser.add_argument("--labels", action="append", default=[], help="labels JSON for each --wav, in order")
+    parser.add_argument("--synthetic", type=int, default=0, help="number of utterances in a generated mix")
+    parser.add_argument("--snr", type=float, default=20.0, help="noise level of the generated mix in dB")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--stt", choices=["none", "google", "whisper"], default="none")
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+    if not args.wav and not args.synthetic:
+        args.synthetic = 10
+
+    inputs = []
+    for i, path in enumerate(args.wav):
+        labels = None
+        if i < len(args.labels):
+            with open(args.labels[i], "r", encoding="utf-8") as f:
+                labels = json.load(f)
+        inputs.append((os.path.basename(path), load_wav(path), labels))
+    if args.synthetic:
+        clips = render_phrases(PHRASES, tempfile.mkdtemp(prefix="nexus_bench_"))
+        audio, labels = synthesize_mix(clips, args.synthetic, args.snr, args.seed)
+        inputs.append((f"synthetic x{args.synthetic} @ {args.snr:g} dB", audio, labels))
+
+    backend = None
+    if args.stt != "none":
+        os.environ["stt_backend"] = args.stt
+        from stt import load_stt_backend
+        backend = load_stt_backend()
+
+    model = load_silero_vad()
+    report = []
+    for name, audio, labels in inputs:
+        result = run_pipeline(audio, model, backend)
+        entry = {"input": name, **{k: v for k, v in result.items() if k != "segments"}}
+        entry["segments"] = len(result["segments"])
+        if labels is not None:
+            entry.update(match_segments(result["segments"], labels))
+        if backend is not None and labels and all("text" in label for label in labels):
+            hypothesis = " ".join(segment.get("text", "") for segment in result["segments"])
+            entry["wer"] = word_error_rate(" ".join(label["text"] for label in labels), hypothesis)
+        report.append(entry)
+
+        print(f"\n{name}")
+        for key, value in entry.items():
+            if key != "input":
+                print(f"  {key:22} {value:.4f}" if isinstance(value, float) else f"  {key:22} {value}")
+    print(f"\npeak RSS {max_rss_mb():.1f} MB")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"runs": report, "peak_rss_mb": max_rss_mb()}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
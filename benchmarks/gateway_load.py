@@ -0,0 +1,152 @@
+"""
+Load test for the multi-session gateway.
+
+Opens many concurrent sessions against `python src --gateway` and sends scripted turns from each,
+reporting turns per second, latency percentiles and, for a local server, how many concurrent
+sessions one fully used CPU core sustains. Without --url a server is started in a subprocess with the
+same fake model and stub tools as `turn_throughput.py`.
+
+    python benchmarks/gateway_load.py --sessions 200 --turns 5 --llm-latency 0.5
+    python benchmarks/gateway_load.py --url http://localhost:8765 --sessions 50
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import aiohttp
+
+from turn_throughput import CORPUS, configure_environment, install_fakes, percentile
+
+
+def serve(port: int, llm_latency: float, token_latency: float, tool_latency: float):
+    configure_environment(tempfile.mkdtemp(prefix="nexus_gateway_"))
+    install_fakes(llm_latency, token_latency, tool_latency)
+    import gateway
+    gateway.main(port=port)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def process_cpu_seconds(pid: int) -> float:
+    """
+    The function `process_cpu_seconds` reads the user and system CPU time of a process from /proc.
+
+    :return: The CPU seconds used so far, or NaN where /proc is not available
+    """
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+    except OSError:
+        return float("nan")
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+async def wait_until_up(url: str, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as client:
+        while True:
+            try:
+                async with client.get(f"{url}/stats") as response:
+                    if response.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"gateway at {url} did not start")
+            await asyncio.sleep(0.2)
+
+
+async def run_session(client, url: str, session_id: str, turns: int, latencies: list, errors: list):
+    for i in range(turns):
+        start = time.perf_counter()
+        async with client.post(f"{url}/sessions/{session_id}/messages",
+                               json={"text": CORPUS[i % len(CORPUS)]}) as response:
+            await response.read()
+            if response.status == 200:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors.append(response.status)
+
+
+async def run_load(url: str, sessions: int, turns: int) -> dict:
+    latencies, errors = [], []
+    connector = aiohttp.TCPConnector(limit=0)
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=None)) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(run_session(client, url, f"load-{os.getpid()}-{n}", turns, latencies, errors)
+                               for n in range(sessions)))
+        wall = time.perf_counter() - start
+    return {
+        "sessions": sessions,
+        "turns": len(latencies),
+        "errors": len(errors),
+        "wall_seconds": wall,
+        "turns_per_second": len(latencies) / wall,
+        "latency_ms_p50": 1000 * percentile(latencies, 0.5),
+        "latency_ms_p95": 1000 * percentile(latencies, 0.95),
+        "latency_ms_p99": 1000 * percentile(latencies, 0.99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="benchmark an already running gateway instead of starting one")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[10, 50, 200], help="concurrent sessions")
+    parser.add_argument("--turns", type=int, default=5, help="turns sent by each session")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="fake model latency per call (s)")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="fake model latency per streamed word (s)")
+    parser.add_argument("--tool-latency", type=float, default=0.1, help="fake tool/API latency per call (s)")
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.llm_latency, args.token_latency, args.tool_latency)
+        return
+
+    server, url = None, args.url
+    if url is None:
+        port = free_port()
+        url = f"http://127.0.0.1:{port}"
+        server = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--serve", str(port),
+                                   "--llm-latency", str(args.llm_latency),
+                                   "--token-latency", str(args.token_latency),
+                                   "--tool-latency", str(args.tool_latency)])
+    report = []
+    try:
+        asyncio.run(wait_until_up(url))
+        for sessions in args.sessions:
+            cpu_before = process_cpu_seconds(server.pid) if server else float("nan")
+            entry = asyncio.run(run_load(url, sessions, args.turns))
+            if server:
+                cores = (process_cpu_seconds(server.pid) - cpu_before) / entry["wall_seconds"]
+                entry["server_cores"] = cores
+                entry["sessions_per_core"] = sessions / cores if cores else float("inf")
+            report.append(entry)
+            print(f"{sessions:>6} sessions: {entry['turns_per_second']:8.2f} turns/s  "
+                  f"p50 {entry['latency_ms_p50']:8.1f} ms  p95 {entry['latency_ms_p95']:8.1f} ms  "
+                  f"errors {entry['errors']}"
+                  + (f"  {entry['server_cores']:.2f} cores, {entry['sessions_per_core']:.0f} sessions/core"
+                     if server else ""))
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
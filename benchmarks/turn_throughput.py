@@ -0,0 +1,276 @@
+"""
+Headless end-to-end benchmark for a NEXUS turn.
+
+Swaps `init_chat_model("google_genai:gemini-2.0-flash")` and `TavilySearch` for deterministic local
+fakes with configurable latency, stubs the weather/news HTTP calls, and replays a scripted
+conversation through `run.VoiceLoop.respond` on top of 10 .. 10,000 turns of seeded history. For
+each history size it reports turns per second, the per-turn overhead beyond the fake model and tool
+latency, and how big the state and checkpoints get.
+
+    python benchmarks/turn_throughput.py
+    python benchmarks/turn_throughput.py --history 10 100 1000 10000 --turns 50 --llm-latency 0.2
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import yaml
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+CORPUS = [
+    "hello there how are you doing today",
+    "what is the weather in bangalore",
+    "give me the news on artificial intelligence",
+    "what time is it",
+    "search for the best books on habits",
+    "add call the plumber to my to do list",
+    "tell me a fun fact about octopuses",
+    "show my to do list",
+    "what did i ask you about earlier",
+]
+
+
+class ModelClock:
+    """Sums the latency spent inside the fake model and tools, so it can be subtracted per turn."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.model_seconds = 0.0
+        self.tool_seconds = 0.0
+
+    def sleep(self, seconds: float, kind: str):
+        time.sleep(seconds)
+        with self.lock:
+            if kind == "model":
+                self.model_seconds += seconds
+            else:
+                self.tool_seconds += seconds
+
+
+clock = ModelClock()
+
+
+def install_fakes(llm_latency: float, token_latency: float, tool_latency: float):
+    """
+    The function `install_fakes` replaces the chat model factory, the Tavily search tool and the HTTP
+    JSON helper with local fakes. It must run before `chatbot` and `tools` are imported.
+    """
+    import http_client
+    import langchain.chat_models
+    import langchain_tavily
+    from langchain_core.language_models.chat_models import BaseChatModel
+    from langchain_core.messages import AIMessage, AIMessageChunk
+    from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+    from langchain_core.tools import BaseTool
+
+    def plan(messages):
+        last = messages[-1]
+        if last.type == "tool":
+            return f"Here is what I found. {str(last.content)[:120]}. Anything else?", []
+        text = str(last.content).lower()
+        if "weather" in text:
+            return "", [{"name": "get_weather", "args": {"city": "Bangalore"}, "id": f"call_{time.time_ns()}"}]
+        if "news" in text:
+            return "", [{"name": "get_news", "args": {"topic": "ai"}, "id": f"call_{time.time_ns()}"}]
+        if "search" in text:
+            return "", [{"name": "tavily_search", "args": {"query": text}, "id": f"call_{time.time_ns()}"}]
+        return ("Sure thing. That is an interesting question. "
+                "Here is a short, friendly answer with a couple of sentences in it."), []
+
+    class FakeChatModel(BaseChatModel):
+        @property
+        def _llm_type(self) -> str:
+            return "nexus-benchmark-fake"
+
+        def bind_tools(self, tools, **kwargs):
+            return self
+
+        def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+            clock.sleep(llm_latency, "model")
+            content, tool_calls = plan(messages)
+            return ChatResult(generations=[ChatGeneration(message=AIMessage(content=content, tool_calls=tool_calls))])
+
+        def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+            clock.sleep(llm_latency, "model")
+            content, tool_calls = plan(messages)
+            if tool_calls:
+                yield ChatGenerationChunk(message=AIMessageChunk(content="", tool_call_chunks=[
+                    {"name": call["name"], "args": json.dumps(call["args"]), "id": call["id"], "index": i}
+                    for i, call in enumerate(tool_calls)]))
+                return
+            for word in content.split(" "):
+                clock.sleep(token_latency, "model")
+                chunk = ChatGenerationChunk(message=AIMessageChunk(content=word + " "))
+                if run_manager:
+                    run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+                yield chunk
+
+    class FakeTavilySearch(BaseTool):
+        name: str = "tavily_search"
+        description: str = "Searches the web."
+        max_results: int = 2
+
+        def _run(self, query: str) -> str:
+            clock.sleep(tool_latency, "tool")
+            return json.dumps({"query": query, "results": [
+                {"title": f"Result {i} for {query}", "url": f"https://example.com/{i}",
+                 "content": "Lorem ipsum dolor sit amet. " * 40} for i in range(self.max_results)]})
+
+    def fake_get_json(url, params=None):
+        clock.sleep(tool_latency, "tool")
+        if "weather" in url:
+            return {"cod": 200, "main": {"temp": 27.5}, "weather": [{"description": "scattered clouds"}]}
+        return {"status": "ok", "articles": [{"title": f"Headline {i} about {params['q']}"} for i in range(10)]}
+
+    langchain.chat_models.init_chat_model = lambda *args, **kwargs: FakeChatModel()
+    langchain_tavily.TavilySearch = FakeTavilySearch
+    http_client.get_json = fake_get_json
+
+
+def configure_environment(workdir: str):
+    """
+    The function `configure_environment` loads the default config into the environment, pointing
+    every file NEXUS writes at a temporary directory.
+    """
+    with open(os.path.join(ROOT, "config.default.yaml")) as f:
+        for key, value in yaml.safe_load(f).items():
+            os.environ[key] = str(value)
+    os.environ["nexus_files"] = os.path.join(workdir, ".nexus")
+    os.environ["log_file_path"] = os.path.join(workdir, "logs.jsonl")
+    os.environ["weather_cache_ttl"] = "0"
+    os.environ["news_cache_ttl"] = "0"
+    os.environ["OPENWEATHER_API_KEY"] = os.environ["NEWSAPI_KEY"] = "benchmark"
+    os.environ.setdefault("LANGSMITH_TRACING", "false")
+
+
+class NullTTS:
+    def say(self, text):
+        pass
+
+    def wait(self):
+        pass
+
+    def is_busy(self):
+        return False
+
+
+def seed_history(nexus, config, turns: int):
+    messages = []
+    for i in range(turns):
+        messages.append({"role": "user", "content": f"{CORPUS[i % len(CORPUS)]} (turn {i})"})
+        messages.append({"role": "assistant", "content": f"Answer number {i}. It has two sentences."})
+    if messages:
+        nexus.update_state(config, {"messages": messages}, as_node="chatbot")
+
+
+def checkpoint_bytes(store) -> tuple:
+    stats = store.stats()
+    return stats["checkpoints"], (stats["checkpoint_bytes"] + stats["checkpoint_write_bytes"]
+                                  + stats["message_blob_bytes"])
+
+
+async def replay(voice, turns: int) -> tuple:
+    """
+    The function `replay` runs scripted turns through the voice loop's turn handler, the way the
+    assistant answers a transcript, and times them.
+
+    :param voice: A `run.VoiceLoop` without a microphone
+    :param turns: How many turns to run
+    :type turns: int
+    :return: A tuple `(durations, overheads)` in seconds, one entry per turn
+    """
+    durations, overheads = [], []
+    await voice.open_graph()
+    devnull = open(os.devnull, "w")
+    try:
+        for i in range(turns):
+            model_before, tool_before = clock.model_seconds, clock.tool_seconds
+            start = time.perf_counter()
+            stdout, sys.stdout = sys.stdout, devnull
+            try:
+                await voice.respond(CORPUS[i % len(CORPUS)])
+            finally:
+                sys.stdout = stdout
+            elapsed = time.perf_counter() - start
+            durations.append(elapsed)
+            overheads.append(elapsed - (clock.model_seconds - model_before) - (clock.tool_seconds - tool_before))
+    finally:
+        devnull.close()
+        await voice.close()
+    return durations, overheads
+
+
+def percentile(values: list, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--history", type=int, nargs="+", default=[10, 100, 1000, 10000],
+                        help="turns of seeded history to benchmark on top of")
+    parser.add_argument("--turns", type=int, default=30, help="scripted turns replayed per history size")
+    parser.add_argument("--corpus", help="text file with one user utterance per line")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="fake model latency per call (s)")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="fake model latency per streamed word (s)")
+    parser.add_argument("--tool-latency", type=float, default=0.0, help="fake tool/API latency per call (s)")
+    parser.add_argument("--real-tts", action="store_true", help="speak answers instead of stubbing TTS")
+    parser.add_argument("--real-logging", action="store_true", help="write the JSONL log instead of stubbing it")
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    global CORPUS
+    if args.corpus:
+        with open(args.corpus, "r", encoding="utf-8") as f:
+            CORPUS = [line.strip() for line in f if line.strip()]
+
+    workdir = tempfile.mkdtemp(prefix="nexus_turns_")
+    configure_environment(workdir)
+    install_fakes(args.llm_latency, args.token_latency, args.tool_latency)
+
+    import chatbot
+    import run
+    if not args.real_tts:
+        run.tts = NullTTS()
+    if not args.real_logging:
+        run.add_user_log = run.add_nexus_log = lambda message: None
+
+    report = []
+    for history in args.history:
+        thread_id = f"bench-{history}"
+        run.config = {"configurable": {"thread_id": thread_id}}
+        seed_history(chatbot.nexus, run.config, history)
+        durations, overheads = asyncio.run(replay(run.VoiceLoop(run.config), args.turns))
+
+        state = chatbot.nexus.get_state(run.config).values
+        checkpoints, stored = checkpoint_bytes(chatbot.checkpoint_store)
+        entry = {
+            "history_turns": history,
+            "turns_per_second": len(durations) / sum(durations),
+            "overhead_ms_mean": 1000 * sum(overheads) / len(overheads),
+            "overhead_ms_p95": 1000 * percentile(overheads, 0.95),
+            "state_messages": len(state["messages"]),
+            "state_bytes": len(json.dumps([str(m.content) for m in state["messages"]])),
+            "checkpoints": checkpoints,
+            "checkpoint_bytes": stored,
+        }
+        report.append(entry)
+        print(f"history {history:>6}: {entry['turns_per_second']:8.2f} turns/s  "
+              f"overhead {entry['overhead_ms_mean']:8.2f} ms (p95 {entry['overhead_ms_p95']:8.2f})  "
+              f"state {entry['state_messages']:>6} msgs / {entry['state_bytes']:>9} B  "
+              f"checkpoints {checkpoints:>5} / {stored:>11} B")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,11 @@
-from dotenv import load_dotenv
-from utils import load_config
+import time
+
+started = time.perf_counter()
+
+import argparse  # noqa: E402
+
+from dotenv import load_dotenv  # noqa: E402
+from utils import load_config  # noqa: E402
 
 
 load_dotenv()
@@ -7,5 +13,18 @@ load_config()
 
 
 if __name__ == "__main__":
-    from run import main
-    main()
+    parser = argparse.ArgumentParser(prog="nexus")
+    parser.add_argument("--gateway", action="store_true",
+                        help="serve many conversations over HTTP/WebSocket instead of the local mic")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="report import and init time of each component, then exit")
+    args = parser.parse_args()
+    if args.profile_startup:
+        from startup import profile_startup
+        profile_startup(started)
+    else:
+        if args.gateway:
+            from gateway import main
+        else:
+            from run import main
+        main()
@@ -1,29 +1,51 @@
+import asyncio
 import os
+import sqlite3
 from typing import Annotated
 from typing_extensions import TypedDict
 
-from langgraph.checkpoint.memory import MemorySaver
+from langgraph.constants import TAG_NOSTREAM
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
-from langgraph.prebuilt import ToolNode, tools_condition
+from langgraph.prebuilt import tools_condition
+from langgraph.utils.runnable import RunnableCallable
 
 from langchain.chat_models import init_chat_model
+from langchain_core.messages import RemoveMessage
+from langchain_core.runnables import RunnableConfig
 
 from langchain_tavily import TavilySearch
 
+from checkpoints import CheckpointStore, RetainingSqliteSaver
+from context_window import message_text, split_for_budget
+from intents import afast_path, fast_path
+from long_term_memory import format_recalled, memory_index
+from metrics import timer
+from startup import Lazy
+from tool_node import ParallelToolNode
+from tool_outputs import compact_message, expand_tool_output
+from todo_tool import TODO_TOOLS, todo_list_enabled
 from tools import custom_tools
+from utils import nexus_file
 
-llm = init_chat_model("google_genai:gemini-2.0-flash")
+# The model client is built on first use (or by `run.warm_up`), not when the graph is imported
+llm = Lazy("llm", lambda: init_chat_model("google_genai:gemini-2.0-flash"))
+
+MAX_CONTEXT_TOKENS = int(os.environ.get("max_context_tokens", 8000))
 
 
 class State(TypedDict):
     messages: Annotated[list, add_messages]
+    summary: str
+    recalled: str
 
 
 nexus_builder = StateGraph(State)
 
-tools = [*custom_tools, TavilySearch(max_results=2)]
-llm_with_tools = llm.bind_tools(tools)
+tools = [*custom_tools, expand_tool_output, TavilySearch(max_results=2)]
+llm_with_tools = Lazy("llm_with_tools", lambda: llm.bind_tools(tools))
+# For runs that may not use the owner's to-do list, e.g. gateway sessions
+llm_without_todo = Lazy("llm_without_todo", lambda: llm.bind_tools([t for t in tools if t.name not in TODO_TOOLS]))
 
 
 system_message = {
@@ -36,59 +58,232 @@ system_message = {
 }
 
 
-def chatbot(state: State):
+summary_instructions = (
+    "You maintain a running summary of a conversation between a user and their voice assistant. "
+    "Merge the new messages into the existing summary. Keep facts about the user, their preferences, "
+    "open tasks and anything they may refer back to; drop small talk and raw tool output. "
+    "Reply with the updated summary only."
+)
+
+
+def summarize(summary: str, messages: list) -> str:
+    """
+    The function `summarize` folds messages that no longer fit in the context window into the rolling
+    conversation summary. Messages are folded in batches that fit the token budget, so even a long
+    imported history never produces an oversized summarization prompt.
+
+    :param summary: The current rolling summary, or an empty string
+    :type summary: str
+    :param messages: The messages being evicted from the prompt, oldest first
+    :type messages: list
+    :return: The updated summary
+    """
+    batch, batch_chars = [], 0
+    for i, message in enumerate(messages):
+        line = f"{message.type}: {message_text(message)[:1000]}"
+        batch.append(line)
+        batch_chars += len(line)
+        if batch_chars >= MAX_CONTEXT_TOKENS * 4 or i == len(messages) - 1:
+            # Tagged out of the message stream so summaries are never spoken
+            summary = llm.invoke([
+                {"role": "system", "content": summary_instructions},
+                {"role": "user", "content": (
+                    f"Current summary:\n{summary or '(none)'}\n\n"
+                    "New messages:\n" + "\n".join(batch)
+                )}
+            ], config={"tags": [TAG_NOSTREAM]}).content
+            batch, batch_chars = [], 0
+    return summary
+
+
+def _fold_evicted(state: State) -> tuple:
+    """
+    The function `_fold_evicted` folds the oldest turns into the rolling summary when the conversation
+    no longer fits in `MAX_CONTEXT_TOKENS`.
+
+    :param state: The current graph state
+    :type state: State
+    :return: A tuple `(update, prompt)`: the state update so far and the messages to send the model,
+    system prompt included
+    """
+    update = {"messages": []}
+    summary = state.get("summary", "")
+    evicted, kept = split_for_budget(state["messages"], MAX_CONTEXT_TOKENS)
+    if evicted:
+        with timer("summarize"):
+            summary = summarize(summary, evicted)
+        update["summary"] = summary
+        update["messages"] = [RemoveMessage(id=message.id) for message in evicted]
+
+    system_prompt = system_message
+    if summary or state.get("recalled"):
+        content = system_message["content"]
+        if summary:
+            content += f"\n\nSummary of the earlier conversation:\n{summary}"
+        if state.get("recalled"):
+            content += f"\n\nPossibly relevant exchanges from earlier conversations:\n{state['recalled']}"
+        system_prompt = {"role": "system", "content": content}
+    return update, [system_prompt] + kept
+
+
+def _model(config: RunnableConfig):
+    return llm_with_tools if todo_list_enabled(config) else llm_without_todo
+
+
+def chatbot(state: State, config: RunnableConfig):
     """
     The `chatbot` function takes a `State` object as input and returns a dictionary with a list of
-    messages processed by the `llm_with_tools` tool.
+    messages processed by the `llm_with_tools` tool. When the conversation no longer fits in
+    `MAX_CONTEXT_TOKENS`, the oldest turns are folded into the rolling summary and removed from the
+    state, so the prompt sent per turn stays roughly constant in size.
 
     :param state: The `state` parameter in the `chatbot` function likely represents the current state of
     the chatbot, which may include information such as previous messages, user input, or any other
     relevant data needed for the chatbot to process and respond to user interactions
     :type state: State
+    :param config: The run config; with `"todo_list": False` the model is not offered the to-do tools
+    :type config: RunnableConfig
     :return: A dictionary is being returned with a key "messages" containing a list of messages
-    generated by invoking the llm_with_tools function on the messages stored in the state.
+    generated by invoking the llm_with_tools function on the messages stored in the state, along with
+    removals of evicted messages and the updated "summary" when the budget was exceeded.
     """
-    state_with_personality = {
-        "messages": [system_message] + state["messages"]
-    }
-    return {"messages": [llm_with_tools.invoke(state_with_personality["messages"])]}
+    update, prompt = _fold_evicted(state)
+    with timer("chatbot"):
+        update["messages"].append(_model(config).invoke(prompt))
+    return update
 
 
-nexus_builder.add_node("chatbot", chatbot)
+async def achatbot(state: State, config: RunnableConfig):
+    """
+    The function `achatbot` is the async form of `chatbot`, used by `ainvoke` and `astream`. The model
+    call is awaited rather than run on a thread, so cancelling the run stops generation right away.
 
-tool_node = ToolNode(tools=tools)
-nexus_builder.add_node("tools", tool_node)
+    :param state: The current graph state
+    :type state: State
+    :param config: The run config
+    :type config: RunnableConfig
+    :return: The same update as `chatbot`
+    """
+    update, prompt = await asyncio.to_thread(_fold_evicted, state)
+    with timer("chatbot"):
+        update["messages"].append(await _model(config).ainvoke(prompt))
+    return update
 
 
-nexus_builder.add_conditional_edges(
-    "chatbot",
-    tools_condition
-)
+nexus_builder.add_node("chatbot", RunnableCallable(chatbot, achatbot, name="chatbot"))
+
+tool_node = ParallelToolNode(tools=tools)
+nexus_builder.add_node("tools", tool_node)
+
 
-nexus_builder.add_edge(START, "chatbot")
 nexus_builder.add_edge("tools", "chatbot")
 
 
+def route_fast_path(state: State):
+    """
+    The function `route_fast_path` ends the turn when the `fast_path` node already answered it and
+    otherwise hands the turn to the `chatbot` node.
+
+    :param state: The current graph state
+    :type state: State
+    :return: END if the last message is an assistant reply, otherwise "recall"
+    """
+    if state["messages"][-1].type == "ai":
+        return END
+    return "recall"
+
+
+def recall(state: State, config: RunnableConfig):
+    """
+    The function `recall` looks up the past exchanges most relevant to the latest user turn in the
+    long-term memory index, so only those reach the prompt instead of the whole history. Exchanges
+    that are still in the conversation state are skipped. Callers serving other people's
+    conversations turn it off with `"long_term_memory": False` in the configurable.
+
+    :param state: The current graph state
+    :type state: State
+    :param config: The run config
+    :type config: RunnableConfig
+    :return: A state update with the recalled exchanges as text
+    """
+    if not config.get("configurable", {}).get("long_term_memory", True):
+        return {"recalled": ""}
+    with timer("recall"):
+        in_prompt = {message_text(message) for message in state["messages"] if message.type == "human"}
+        exchanges = memory_index.search(message_text(state["messages"][-1]), exclude=in_prompt)
+    return {"recalled": format_recalled(exchanges)}
+
+
+# Deterministic commands are answered before the model is ever called
+nexus_builder.add_node("fast_path", RunnableCallable(fast_path, afast_path, name="fast_path"))
+nexus_builder.add_edge(START, "fast_path")
+nexus_builder.add_conditional_edges("fast_path", route_fast_path)
+nexus_builder.add_node("recall", recall)
+nexus_builder.add_edge("recall", "chatbot")
+
+
 def should_end(state: State):
     """
-    The function `should_end` checks if the last message in the state contains tool calls and returns
-    "tools" if it does, otherwise it returns END.
+    The function `should_end` sends the turn to the tools when the last message asks for tool calls,
+    and otherwise to the `compact` node that finishes it.
 
-    :param state: The `state` parameter is expected to be a dictionary containing information about the
-    current state of the program or application. In this context, it seems to have a key "messages"
-    which is a list of messages. The function `should_end` checks the last message in the list and if it
-    is
+    :param state: The current graph state
     :type state: State
-    :return: "tools" if the last message in the state is a dictionary with a key "tool_calls" that is
-    not empty. Otherwise, it is returning the variable END.
+    :return: "tools" if the last message has tool calls, otherwise "compact"
     """
-    last = state["messages"][-1]
-    if isinstance(last, dict) and "tool_calls" in last and last["tool_calls"]:
-        return "tools"
-    return END
+    return "tools" if tools_condition(state) == "tools" else "compact"
+
+
+def compact(state: State):
+    """
+    The function `compact` runs once the turn is answered and moves large tool results out of the
+    conversation state into the tool output store, leaving a digest and a reference the model can
+    expand with `expand_tool_output`. The answer itself was made from the full results; later turns
+    and every later checkpoint only carry the digest.
+
+    :param state: The current graph state
+    :type state: State
+    :return: A state update replacing the compacted tool messages
+    """
+    compacted = [compact_message(message) for message in state["messages"]]
+    return {"messages": [message for message in compacted if message is not None]}
 
 
 nexus_builder.add_conditional_edges("chatbot", should_end)
-nexus_builder.set_entry_point("chatbot")
-memory = MemorySaver()
-nexus = nexus_builder.compile(checkpointer=memory)
+nexus_builder.add_node("compact", compact)
+nexus_builder.add_edge("compact", END)
+
+
+def compile_nexus(checkpointer):
+    """
+    The function `compile_nexus` compiles the NEXUS graph against a given checkpointer, e.g. an async
+    one for callers that use `ainvoke`.
+
+    :param checkpointer: A langgraph checkpointer
+    :return: The compiled graph
+    """
+    return nexus_builder.compile(checkpointer=checkpointer)
+
+
+# Messages are stored once each and old checkpoints are pruned, so the file stays bounded in long runs
+checkpoint_store = CheckpointStore(nexus_file("checkpoints.sqlite"))
+checkpoint_conn = sqlite3.connect(nexus_file("checkpoints.sqlite"), check_same_thread=False)
+memory = RetainingSqliteSaver(checkpoint_conn, checkpoint_store)
+nexus = compile_nexus(memory)
+
+
+def import_history(config: dict, messages: list) -> bool:
+    """
+    The function `import_history` seeds the persisted state of a thread straight from logged messages,
+    without invoking the model. It only runs once: threads that already have state are left untouched.
+
+    :param config: The graph config holding the `thread_id` to seed
+    :type config: dict
+    :param messages: A list of `{"role", "content"}` dictionaries in conversation order
+    :type messages: list
+    :return: True if the thread was seeded, False if it already had state or there was nothing to import
+    """
+    if not messages or nexus.get_state(config).values.get("messages"):
+        return False
+    nexus.update_state(config, {"messages": messages}, as_node="compact")
+    return True
@@ -0,0 +1,283 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+CHECKPOINT_KEEP = int(os.environ.get("checkpoint_keep", 20))
+CHECKPOINT_MAX_BYTES = int(os.environ.get("checkpoint_max_bytes", 64 * 1024 * 1024))
+
+# Placeholder stored instead of the message list; the messages themselves live in the `blobs` table
+_REFS = "__nexus_message_refs__"
+# How many deleted checkpoints to let pile up before sweeping unreferenced message blobs
+_GC_EVERY = 64
+_BLOB_CACHE_SIZE = 4096
+_SQL_BATCH = 500
+
+
+class CompactSerializer(JsonPlusSerializer):
+    """
+    Serializes checkpoints with their message list replaced by content hashes. Every message is
+    stored once in a `blobs` table, so the hundreds of checkpoints that share a conversation prefix do
+    not each carry a full copy of it. Checkpoints written before this existed still load as they are.
+    """
+
+    def __init__(self, store: "CheckpointStore"):
+        super().__init__()
+        self.store = store
+
+    def dumps_typed(self, obj):
+        if _is_checkpoint(obj) and isinstance(obj["channel_values"].get("messages"), list):
+            blobs = [JsonPlusSerializer.dumps_typed(self, message) for message in obj["channel_values"]["messages"]]
+            refs = self.store.put_blobs(blobs)
+            obj = {**obj, "channel_values": {**obj["channel_values"], "messages": {_REFS: refs}}}
+        return super().dumps_typed(obj)
+
+    def loads_typed(self, data):
+        obj = super().loads_typed(data)
+        if _is_checkpoint(obj):
+            messages = obj["channel_values"].get("messages")
+            if isinstance(messages, dict) and _REFS in messages:
+                obj["channel_values"]["messages"] = [
+                    JsonPlusSerializer.loads_typed(self, blob)
+                    for blob in self.store.get_blobs(messages[_REFS])
+                ]
+        return obj
+
+    def refs(self, data) -> list:
+        """
+        The function `refs` returns the message hashes a serialized checkpoint points to.
+
+        :param data: A `(type, bytes)` pair as stored in the `checkpoints` table
+        :type data: tuple
+        :return: A list of hashes, empty for checkpoints stored without references
+        """
+        obj = super().loads_typed(data)
+        if _is_checkpoint(obj):
+            messages = obj["channel_values"].get("messages")
+            if isinstance(messages, dict) and _REFS in messages:
+                return messages[_REFS]
+        return []
+
+
+def _is_checkpoint(obj) -> bool:
+    return isinstance(obj, dict) and "channel_values" in obj and "channel_versions" in obj
+
+
+class CheckpointStore:
+    """
+    Owns the message blob table next to the checkpointer's own tables and enforces the retention
+    policy: the last `keep` checkpoints per thread, and a byte cap over everything stored that evicts
+    the oldest checkpoints first. A thread's latest checkpoint is never evicted, so no conversation
+    is lost.
+
+    It uses a connection of its own, so it can serve both the sync and the async checkpointer.
+    """
+
+    def __init__(self, path: str, keep: int = CHECKPOINT_KEEP, max_bytes: int = CHECKPOINT_MAX_BYTES):
+        self.keep = keep
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        SqliteSaver(self.conn).setup()
+        self.conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS blobs (
+                hash TEXT PRIMARY KEY,
+                type TEXT NOT NULL,
+                data BLOB NOT NULL
+            );
+        """)
+        self.serializer = CompactSerializer(self)
+        self.cache = OrderedDict()  # hash -> (type, bytes), most recently used last
+        self.deleted_since_gc = 0
+        self.evicted = 0
+
+    def put_blobs(self, blobs: list) -> list:
+        """
+        The function `put_blobs` stores serialized messages by content hash, skipping the ones already
+        stored.
+
+        :param blobs: A list of `(type, bytes)` pairs
+        :type blobs: list
+        :return: The hashes, in the same order
+        """
+        refs, new = [], []
+        with self.lock:
+            for type_, data in blobs:
+                ref = hashlib.sha1(type_.encode("utf-8") + b"\0" + data).hexdigest()
+                refs.append(ref)
+                if ref not in self.cache:
+                    new.append((ref, type_, data))
+                self._remember(ref, (type_, data))
+            if new:
+                self.conn.executemany("INSERT OR IGNORE INTO blobs (hash, type, data) VALUES (?, ?, ?)", new)
+                self.conn.commit()
+        return refs
+
+    def get_blobs(self, refs: list) -> list:
+        """
+        The function `get_blobs` loads serialized messages by hash.
+
+        :param refs: The hashes to load
+        :type refs: list
+        :return: A list of `(type, bytes)` pairs in the same order
+        """
+        with self.lock:
+            missing = list({ref for ref in refs if ref not in self.cache})
+            for i in range(0, len(missing), _SQL_BATCH):
+                batch = missing[i:i + _SQL_BATCH]
+                rows = self.conn.execute(
+                    f"SELECT hash, type, data FROM blobs WHERE hash IN ({','.join('?' * len(batch))})", batch)
+                for ref, type_, data in rows:
+                    self._remember(ref, (type_, data))
+            found = []
+            for ref in refs:
+                if ref not in self.cache:
+                    raise KeyError(f"Checkpoint message {ref} is missing from the blob table")
+                found.append(self.cache[ref])
+                self.cache.move_to_end(ref)
+            return found
+
+    def _remember(self, ref: str, blob: tuple):
+        self.cache[ref] = blob
+        self.cache.move_to_end(ref)
+        while len(self.cache) > _BLOB_CACHE_SIZE:
+            self.cache.popitem(last=False)
+
+    def retain(self, thread_id: str, checkpoint_ns: str = ""):
+        """
+        The function `retain` applies the retention policy after a checkpoint of a thread was written.
+
+        :param thread_id: The thread that was just checkpointed
+        :type thread_id: str
+        :param checkpoint_ns: The checkpoint namespace
+        :type checkpoint_ns: str
+        """
+        with self.lock:
+            deleted = self.conn.execute(
+                """DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id NOT IN (
+                       SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?
+                       ORDER BY checkpoint_id DESC LIMIT ?)""",
+                (thread_id, checkpoint_ns, thread_id, checkpoint_ns, self.keep)).rowcount
+            if deleted:
+                self.conn.execute(
+                    """DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id NOT IN (
+                           SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?)""",
+                    (thread_id, checkpoint_ns, thread_id, checkpoint_ns))
+            self.conn.commit()
+            self.deleted_since_gc += deleted
+            self._enforce_byte_cap()
+
+    def retain_all(self):
+        """
+        The function `retain_all` applies the retention policy to every thread, for checkpointers that
+        do not call `retain` on each write.
+        """
+        with self.lock:
+            threads = self.conn.execute("SELECT DISTINCT thread_id, checkpoint_ns FROM checkpoints").fetchall()
+        for thread_id, checkpoint_ns in threads:
+            self.retain(thread_id, checkpoint_ns)
+
+    def _enforce_byte_cap(self):
+        if self.deleted_since_gc >= _GC_EVERY:
+            self._collect_garbage()
+        while self._total_bytes() > self.max_bytes:
+            # Oldest first, but never the latest checkpoint of a thread
+            oldest = self.conn.execute(
+                """SELECT thread_id, checkpoint_ns, checkpoint_id FROM checkpoints AS c
+                   WHERE checkpoint_id < (SELECT MAX(checkpoint_id) FROM checkpoints
+                                          WHERE thread_id = c.thread_id AND checkpoint_ns = c.checkpoint_ns)
+                   ORDER BY checkpoint_id LIMIT 32""").fetchall()
+            if not oldest:
+                break
+            for key in oldest:
+                self.conn.execute(
+                    "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?", key)
+                self.conn.execute(
+                    "DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?", key)
+            self.conn.commit()
+            self.evicted += len(oldest)
+            self.deleted_since_gc += len(oldest)
+            self._collect_garbage()
+
+    def _collect_garbage(self):
+        """
+        The function `_collect_garbage` deletes message blobs that no remaining checkpoint points to.
+        Blobs still in the cache are kept: they were used recently and may belong to a checkpoint that
+        another connection is about to write.
+        """
+        referenced = set()
+        for type_, data in self.conn.execute("SELECT type, checkpoint FROM checkpoints"):
+            referenced.update(self.serializer.refs((type_, data)))
+        stored = [ref for (ref,) in self.conn.execute("SELECT hash FROM blobs")]
+        unreferenced = [(ref,) for ref in stored if ref not in referenced and ref not in self.cache]
+        self.conn.executemany("DELETE FROM blobs WHERE hash = ?", unreferenced)
+        self.conn.commit()
+        self.deleted_since_gc = 0
+
+    def _total_bytes(self) -> int:
+        return sum(self._table_bytes().values())
+
+    def _table_bytes(self) -> dict:
+        return {
+            "checkpoints": self.conn.execute(
+                "SELECT COALESCE(SUM(LENGTH(checkpoint) + LENGTH(metadata)), 0) FROM checkpoints").fetchone()[0],
+            "writes": self.conn.execute("SELECT COALESCE(SUM(LENGTH(value)), 0) FROM writes").fetchone()[0],
+            "blobs": self.conn.execute("SELECT COALESCE(SUM(LENGTH(data)), 0) FROM blobs").fetchone()[0],
+        }
+
+    def stats(self) -> dict:
+        """
+        The function `stats` reports how much the checkpointer holds, to check in long runs that it
+        stays flat.
+
+        :return: A dictionary of counts and sizes in bytes
+        """
+        with self.lock:
+            sizes = self._table_bytes()
+            return {
+                "checkpoints": self.conn.execute("SELECT COUNT(*) FROM checkpoints").fetchone()[0],
+                "checkpoint_threads": self.conn.execute(
+                    "SELECT COUNT(DISTINCT thread_id) FROM checkpoints").fetchone()[0],
+                "checkpoint_bytes": sizes["checkpoints"],
+                "checkpoint_write_bytes": sizes["writes"],
+                "message_blobs": self.conn.execute("SELECT COUNT(*) FROM blobs").fetchone()[0],
+                "message_blob_bytes": sizes["blobs"],
+                "message_blob_cache": len(self.cache),
+                "checkpoints_evicted": self.evicted,
+                "resident_bytes": resident_bytes(),
+            }
+
+
+class RetainingSqliteSaver(SqliteSaver):
+    """
+    A `SqliteSaver` that stores messages compactly and applies the `CheckpointStore` retention
+    policy after every checkpoint.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, store: CheckpointStore):
+        super().__init__(conn, serde=store.serializer)
+        self.store = store
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        saved = super().put(config, checkpoint, metadata, new_versions)
+        self.store.retain(str(config["configurable"]["thread_id"]), config["configurable"]["checkpoint_ns"])
+        return saved
+
+
+def resident_bytes() -> int:
+    """
+    The function `resident_bytes` returns the current resident memory of the process, where /proc is
+    available.
+
+    :return: The resident set size in bytes, or 0 if it cannot be read
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return 0
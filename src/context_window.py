@@ -0,0 +1,66 @@
+import json
+
+from langchain_core.messages import HumanMessage
+
+
+def message_text(message) -> str:
+    """
+    The function `message_text` flattens the content of a message, including any tool call arguments,
+    into plain text.
+
+    :param message: A langchain message
+    :return: The text of the message
+    """
+    content = message.content
+    if isinstance(content, list):
+        content = " ".join(
+            part if isinstance(part, str) else str(part.get("text", ""))
+            for part in content
+        )
+    tool_calls = getattr(message, "tool_calls", None)
+    if tool_calls:
+        content += " " + json.dumps([[call["name"], call["args"]] for call in tool_calls])
+    return content
+
+
+def estimate_tokens(message) -> int:
+    """
+    The function `estimate_tokens` gives a cheap local estimate of the tokens a message costs, at
+    roughly four characters per token plus a small per-message overhead.
+
+    :param message: A langchain message
+    :return: The estimated number of tokens
+    """
+    return len(message_text(message)) // 4 + 4
+
+
+def split_for_budget(messages: list, max_tokens: int) -> tuple:
+    """
+    The function `split_for_budget` decides which of the oldest messages must leave the prompt so the
+    rest fits in `max_tokens`. Once over budget it trims down to half of it, so summarization does not
+    run again on every turn. Cuts only happen right before a user message, which keeps tool calls and
+    their results together, and the latest user turn is always kept whole.
+
+    :param messages: The messages currently held in the graph state
+    :type messages: list
+    :param max_tokens: The token budget for the conversation part of the prompt
+    :type max_tokens: int
+    :return: A tuple `(evicted, kept)` of message lists
+    """
+    costs = [estimate_tokens(message) for message in messages]
+    if sum(costs) <= max_tokens:
+        return [], messages
+
+    boundaries = [i for i, message in enumerate(messages) if isinstance(message, HumanMessage)]
+    if not boundaries:
+        return [], messages
+
+    target = max_tokens // 2
+    cut = boundaries[-1]
+    remaining = sum(costs[cut:])
+    for boundary in reversed(boundaries[:-1]):
+        extra = sum(costs[boundary:cut])
+        if remaining + extra > target:
+            break
+        cut, remaining = boundary, remaining + extra
+    return messages[:cut], messages[cut:]
@@ -0,0 +1,255 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import aiosqlite
+import numpy as np
+import speech_recognition as sr
+from aiohttp import WSMsgType, web
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+from silero_vad import load_silero_vad
+
+from chatbot import checkpoint_store, compile_nexus
+from stt import load_stt_backend
+from utils import nexus_file
+from vad import MIN_SEGMENT_ENERGY, VAD_SETTINGS, StreamingVAD, segment_energy
+
+GATEWAY_HOST = os.environ.get("gateway_host", "127.0.0.1")
+GATEWAY_PORT = int(os.environ.get("gateway_port", 8765))
+SESSION_QUEUE_SIZE = int(os.environ.get("gateway_session_queue", 8))
+IDLE_TIMEOUT = float(os.environ.get("gateway_idle_timeout", 600))
+CPU_WORKERS = int(os.environ.get("gateway_cpu_workers", os.cpu_count() or 4))
+MAX_CONCURRENT_TURNS = int(os.environ.get("gateway_max_concurrent_turns", 64))
+
+# Audio frames sent over the WebSocket are raw 16 kHz mono int16 PCM
+SAMPLE_RATE = 16000
+
+
+class Session:
+    """
+    One conversation served by the gateway. Turns are queued on a bounded inbox and run one after
+    another on the session's own `thread_id`, so sessions run concurrently with each other while each
+    conversation stays in order.
+    """
+
+    def __init__(self, gateway, session_id: str):
+        self.gateway = gateway
+        self.id = session_id
+        # The long-term memory index and the to-do list are the owner's, so sessions never reach them
+        self.config = {"configurable": {
+            "thread_id": f"gateway-{session_id}", "long_term_memory": False, "todo_list": False
+        }}
+        self.inbox = asyncio.Queue(maxsize=SESSION_QUEUE_SIZE)
+        self.last_active = time.monotonic()
+        self.sockets = set()
+        self.vad = None
+        # Several sockets may send audio to one session, but its Silero state takes one frame at a time
+        self.audio_lock = threading.Lock()
+        self.worker = asyncio.create_task(self._run())
+
+    def touch(self):
+        self.last_active = time.monotonic()
+
+    async def _run(self):
+        while True:
+            text, reply = await self.inbox.get()
+            try:
+                async with self.gateway.turn_slots:
+                    state = await self.gateway.nexus.ainvoke(
+                        {"messages": [{"role": "user", "content": text}]}, config=self.config)
+                if not reply.done():
+                    reply.set_result(state["messages"][-1].content)
+            except Exception as e:
+                if not reply.done():
+                    reply.set_exception(e)
+            finally:
+                self.inbox.task_done()
+                self.touch()
+
+    def submit(self, text: str) -> asyncio.Future:
+        """
+        The function `submit` queues a turn without waiting for room in the inbox.
+
+        :param text: The user's message
+        :type text: str
+        :return: A future resolved with the assistant's reply
+        :raises asyncio.QueueFull: When the session already has `SESSION_QUEUE_SIZE` turns waiting
+        """
+        reply = asyncio.get_running_loop().create_future()
+        self.inbox.put_nowait((text, reply))
+        self.touch()
+        return reply
+
+    async def submit_wait(self, text: str) -> asyncio.Future:
+        """
+        The function `submit_wait` queues a turn, waiting for room in the inbox, which pushes back on
+        WebSocket clients that send faster than their turns complete.
+
+        :param text: The user's message
+        :type text: str
+        :return: A future resolved with the assistant's reply
+        """
+        reply = asyncio.get_running_loop().create_future()
+        await self.inbox.put((text, reply))
+        self.touch()
+        return reply
+
+    def process_audio(self, frame: bytes) -> list:
+        """
+        The function `process_audio` runs one audio frame through this session's VAD and returns the
+        speech segments it completed. It runs on the gateway's CPU pool; each session gets its own
+        Silero model because the model keeps recurrent state, and frames are processed one at a time.
+
+        :param frame: Raw int16 PCM bytes, of even length
+        :type frame: bytes
+        :return: A list of segment dicts
+        """
+        with self.audio_lock:
+            if self.vad is None:
+                self.vad = StreamingVAD(load_silero_vad(), sampling_rate=SAMPLE_RATE, **VAD_SETTINGS)
+            segments = self.vad.process(np.frombuffer(frame, dtype=np.int16))
+        return [segment for segment in segments if segment_energy(segment["audio"]) > MIN_SEGMENT_ENERGY]
+
+    async def close(self):
+        self.worker.cancel()
+        for socket in list(self.sockets):
+            await socket.close()
+
+
+class Gateway:
+    """
+    An asyncio HTTP/WebSocket front end that serves many concurrent NEXUS conversations.
+    """
+
+    def __init__(self):
+        self.sessions = {}
+        self.nexus = None
+        self.turn_slots = asyncio.Semaphore(MAX_CONCURRENT_TURNS)
+        self.cpu_pool = ThreadPoolExecutor(max_workers=CPU_WORKERS, thread_name_prefix="gateway-cpu")
+        self.stt = load_stt_backend()
+
+    def session(self, session_id: str) -> Session:
+        if session_id not in self.sessions:
+            self.sessions[session_id] = Session(self, session_id)
+        return self.sessions[session_id]
+
+    async def evict_idle(self):
+        """
+        The function `evict_idle` periodically drops sessions that have been idle for longer than
+        `IDLE_TIMEOUT`, and prunes old checkpoints. Their conversation stays in the checkpointer, so a
+        returning client resumes it.
+        """
+        while True:
+            await asyncio.sleep(min(IDLE_TIMEOUT, 30))
+            await asyncio.to_thread(checkpoint_store.retain_all)
+            now = time.monotonic()
+            for session_id, session in list(self.sessions.items()):
+                if session.inbox.empty() and not session.sockets and now - session.last_active > IDLE_TIMEOUT:
+                    del self.sessions[session_id]
+                    await session.close()
+
+    async def transcribe(self, segment: dict) -> str:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.cpu_pool, self.stt.transcribe, segment["audio"], SAMPLE_RATE)
+
+    async def handle_message(self, request: web.Request) -> web.Response:
+        """
+        `POST /sessions/{session_id}/messages` with `{"text": ...}` runs one turn and returns
+        `{"reply": ...}`. Answers 429 when the session already has a full inbox.
+        """
+        session = self.session(request.match_info["session_id"])
+        body = await request.json()
+        try:
+            reply = session.submit(body["text"])
+        except asyncio.QueueFull:
+            return web.json_response({"error": "too many pending turns"}, status=429)
+        try:
+            return web.json_response({"reply": await reply})
+        except Exception as e:
+            return web.json_response({"error": str(e)}, status=500)
+
+    async def handle_socket(self, request: web.Request) -> web.WebSocketResponse:
+        """
+        `GET /sessions/{session_id}/ws` upgrades to a WebSocket. Text frames are user messages; binary
+        frames are 16 kHz int16 PCM audio that goes through VAD and STT. The server sends JSON events:
+        `{"type": "transcript" | "reply" | "error", "text": ...}`.
+        """
+        session = self.session(request.match_info["session_id"])
+        socket = web.WebSocketResponse(heartbeat=30)
+        await socket.prepare(request)
+        session.sockets.add(socket)
+        loop = asyncio.get_running_loop()
+        pending = set()
+
+        async def answer(reply):
+            try:
+                await socket.send_json({"type": "reply", "text": await reply})
+            except Exception as e:
+                await socket.send_json({"type": "error", "text": str(e)})
+
+        try:
+            async for message in socket:
+                session.touch()
+                if message.type == WSMsgType.TEXT:
+                    texts = [message.data]
+                elif message.type == WSMsgType.BINARY:
+                    if len(message.data) % 2:
+                        await socket.send_json({"type": "error", "text": "audio frames must be int16 PCM"})
+                        continue
+                    segments = await loop.run_in_executor(self.cpu_pool, session.process_audio, message.data)
+                    texts = []
+                    for segment in segments:
+                        try:
+                            text = await self.transcribe(segment)
+                        except (sr.UnknownValueError, sr.RequestError):
+                            continue
+                        await socket.send_json({"type": "transcript", "text": text})
+                        texts.append(text)
+                else:
+                    continue
+                for text in texts:
+                    task = asyncio.create_task(answer(await session.submit_wait(text)))
+                    pending.add(task)
+                    task.add_done_callback(pending.discard)
+        finally:
+            session.sockets.discard(socket)
+            for task in pending:
+                task.cancel()
+        return socket
+
+    async def handle_stats(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            "sessions": len(self.sessions),
+            "queued_turns": sum(session.inbox.qsize() for session in self.sessions.values()),
+            **checkpoint_store.stats(),
+        })
+
+    async def lifecycle(self, app: web.Application):
+        async with aiosqlite.connect(nexus_file("checkpoints.sqlite")) as conn:
+            self.nexus = compile_nexus(AsyncSqliteSaver(conn, serde=checkpoint_store.serializer))
+            evictor = asyncio.create_task(self.evict_idle())
+            yield
+            evictor.cancel()
+            for session in list(self.sessions.values()):
+                await session.close()
+            self.cpu_pool.shutdown(wait=False, cancel_futures=True)
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.cleanup_ctx.append(self.lifecycle)
+        app.router.add_post("/sessions/{session_id}/messages", self.handle_message)
+        app.router.add_get("/sessions/{session_id}/ws", self.handle_socket)
+        app.router.add_get("/stats", self.handle_stats)
+        return app
+
+
+def main(host: str = None, port: int = None):
+    """
+    The main function serves NEXUS over HTTP and WebSocket until interrupted.
+    """
+    async def create_app():
+        return Gateway().app()
+
+    web.run_app(create_app(), host=host or GATEWAY_HOST, port=port or GATEWAY_PORT)
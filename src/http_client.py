@@ -0,0 +1,138 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+CONNECT_TIMEOUT = float(os.environ.get("http_connect_timeout", 3.05))
+READ_TIMEOUT = float(os.environ.get("http_read_timeout", 10))
+HTTP_RETRIES = int(os.environ.get("http_retries", 3))
+# Longest wait a server's Retry-After header can ask for, and the time after the first failed attempt
+# past which no retry is started, so a rate-limited API cannot hold a tool thread for long
+HTTP_MAX_RETRY_AFTER = float(os.environ.get("http_max_retry_after", 2))
+HTTP_RETRY_DEADLINE = float(os.environ.get("http_retry_deadline", 5))
+
+
+class _BoundedRetry(Retry):
+    """
+    A `Retry` that caps the honoured Retry-After at `HTTP_MAX_RETRY_AFTER` and counts as exhausted
+    once `HTTP_RETRY_DEADLINE` seconds have passed since the first failed attempt.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.failed_at = None
+
+    def new(self, **kw):
+        retry = super().new(**kw)
+        retry.failed_at = self.failed_at if self.failed_at is not None else time.monotonic()
+        return retry
+
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        return None if retry_after is None else min(retry_after, HTTP_MAX_RETRY_AFTER)
+
+    def is_exhausted(self) -> bool:
+        if self.failed_at is not None and time.monotonic() - self.failed_at >= HTTP_RETRY_DEADLINE:
+            return True
+        return super().is_exhausted()
+
+
+def _build_session() -> requests.Session:
+    """
+    The function `_build_session` creates a `requests.Session` with a keep-alive connection pool and
+    retries with exponential backoff for idempotent requests. Failed connections and error statuses
+    are retried; a read that timed out is not, since the server may still be stuck on it.
+
+    :return: The configured session
+    """
+    retry = _BoundedRetry(
+        total=HTTP_RETRIES,
+        read=0,
+        backoff_factor=0.5,
+        backoff_max=HTTP_MAX_RETRY_AFTER,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(["GET"]),
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=8, pool_maxsize=8, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+session = _build_session()
+
+
+def get_json(url: str, params: dict = None):
+    """
+    The function `get_json` performs a GET request on the shared session with connect and read
+    timeouts and returns the decoded JSON body.
+
+    :param url: The URL to request
+    :type url: str
+    :param params: Query parameters for the request
+    :type params: dict
+    :return: The decoded JSON response
+    """
+    response = session.get(url, params=params, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+    return response.json()
+
+
+class TTLCache:
+    """
+    A thread-safe, size-bounded LRU cache whose entries expire `ttl` seconds after they were stored.
+    """
+
+    def __init__(self, ttl: float, maxsize: int = 128):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """
+        The function `get` returns a fresh cached value, or None when the key is missing or expired.
+
+        :param key: The cache key
+        :return: The cached value or None
+        """
+        with self.lock:
+            item = self.data.get(key)
+            if item is not None and item[0] > time.monotonic():
+                self.data.move_to_end(key)
+                self.hits += 1
+                return item[1]
+            if item is not None:
+                del self.data[key]
+            self.misses += 1
+            return None
+
+    def __contains__(self, key) -> bool:
+        with self.lock:
+            item = self.data.get(key)
+            return item is not None and item[0] > time.monotonic()
+
+    def set(self, key, value):
+        """
+        The function `set` stores a value and evicts the least recently used entries beyond `maxsize`.
+
+        :param key: The cache key
+        :param value: The value to store
+        """
+        with self.lock:
+            self.data[key] = (time.monotonic() + self.ttl, value)
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self.data)}
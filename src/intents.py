@@ -0,0 +1,156 @@
+import asyncio
+import os
+import re
+from collections import Counter
+from uuid import uuid4
+
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableConfig
+
+from tools import get_date, get_news, get_time, get_weather
+from todo_tool import TODO_TOOLS, TODO_WRITE_TOOLS, add_item, show_todo_list, todo_list_enabled, wait_for_todo_changes
+
+# Hit/miss counters for the fast path, e.g. intent_stats["hit"], intent_stats["hit:get_time"]. A hit
+# is counted once the fast path has answered the turn, not when a command merely matches
+intent_stats = Counter()
+
+_todo = r"(?:my |the )?(?:to ?do|to-do)(?: list)?"
+
+# (pattern, tool, reply template); named groups in the pattern become the tool arguments
+_intents = [
+    (re.compile(r"(?:what(?:'s| is) the time|what time is it|tell me the time)(?: now| right now)?"),
+     get_time, "It's {result}."),
+    (re.compile(r"(?:what(?:'s| is) (?:the |today's )?date(?: today)?|what day is (?:it|today)"
+                r"|what(?:'s| is) today)"),
+     get_date, "Today is {result}."),
+    (re.compile(rf"(?:show|read|list|open)(?: me)? {_todo}|what(?:'s| is) on {_todo}"),
+     show_todo_list, "Here's your to-do list:\n{result}"),
+    (re.compile(rf"add (?P<item>.+?) to {_todo}"),
+     add_item, "{result}"),
+]
+
+
+# Lookups worth starting while the user is still talking. The tools cache their results, so the call
+# the model makes once the turn runs is answered from the cache.
+_prefetch = [
+    (re.compile(r"\bweather\b.*?\b(?:in|at|for) (?P<city>[a-z][a-z .'-]*?)(?: today| now| right now)?$"), get_weather),
+    (re.compile(r"\bnews\b.*?\b(?:on|about|for|regarding) (?P<topic>[a-z0-9][a-z0-9 .'-]*?)(?: today)?$"), get_news),
+]
+
+
+def normalize(text: str) -> str:
+    """
+    The function `normalize` lowercases a transcript, strips punctuation and the assistant's name or
+    a trailing "please", so that small wording differences do not defeat the matcher.
+
+    :param text: The raw transcript
+    :type text: str
+    :return: The normalized transcript
+    """
+    text = re.sub(r"[^a-z0-9' -]", " ", text.lower())
+    text = " ".join(text.split())
+    name = os.environ.get("name", "").lower()
+    if name:
+        text = re.sub(rf"^(?:hey |ok |okay )?{re.escape(name)} ", "", text)
+    return re.sub(r" please$|^please ", "", text)
+
+
+def match_intent(text: str):
+    """
+    The function `match_intent` matches a transcript against the fast-path intents. Only full matches
+    count, so anything with extra clauses goes to the model.
+
+    :param text: The user's transcript
+    :type text: str
+    :return: A tuple `(tool, args, template)` for a match, otherwise None
+    """
+    normalized = normalize(text)
+    for pattern, tool, template in _intents:
+        match = pattern.fullmatch(normalized)
+        if match:
+            return tool, match.groupdict(), template
+    return None
+
+
+def match_prefetch(text: str):
+    """
+    The function `match_prefetch` finds a slow lookup that a (possibly partial) transcript is about to
+    need, such as the weather in a city.
+
+    :param text: A transcript of what the user has said so far
+    :type text: str
+    :return: A tuple `(tool, args)` for a match, otherwise None
+    """
+    normalized = normalize(text)
+    for pattern, tool in _prefetch:
+        match = pattern.search(normalized)
+        if match:
+            return tool, match.groupdict()
+    return None
+
+
+def intent_hit_rate() -> float:
+    """
+    The function `intent_hit_rate` returns the share of turns answered by the fast path.
+
+    :return: The hit rate between 0 and 1
+    """
+    total = intent_stats["hit"] + intent_stats["miss"]
+    return intent_stats["hit"] / total if total else 0.0
+
+
+def _match(state, config: RunnableConfig):
+    last = state["messages"][-1]
+    if last.type != "human" or not isinstance(last.content, str):
+        return None
+    match = match_intent(last.content)
+    if match is None or match[0].name in TODO_TOOLS and not todo_list_enabled(config):
+        intent_stats["miss"] += 1
+        return None
+    return match
+
+
+def _answer(tool, args: dict, template: str) -> dict:
+    tool_call = {"name": tool.name, "args": args, "id": f"fast_{uuid4().hex}", "type": "tool_call"}
+    result = tool.invoke(tool_call)
+    intent_stats["hit"] += 1
+    intent_stats[f"hit:{tool.name}"] += 1
+    return {"messages": [
+        AIMessage(content="", tool_calls=[tool_call]),
+        result,
+        AIMessage(content=template.format(result=result.content))
+    ]}
+
+
+def fast_path(state, config: RunnableConfig):
+    """
+    The `fast_path` node answers high-confidence commands without the model. It runs the matched tool
+    directly and adds the same tool call, tool result and reply messages the model would have produced,
+    so the history stays consistent. Anything else passes through untouched, as do to-do commands in
+    runs that may not use the to-do list.
+
+    :param state: The graph state
+    :param config: The run config
+    :type config: RunnableConfig
+    :return: A dictionary with the new "messages", or an empty dictionary when nothing matched
+    """
+    match = _match(state, config)
+    return _answer(*match) if match is not None else {}
+
+
+async def afast_path(state, config: RunnableConfig):
+    """
+    The function `afast_path` is the async form of `fast_path`. A command that changes the to-do list
+    waits until the run may make changes, so a speculative run never writes before it is confirmed.
+
+    :param state: The graph state
+    :param config: The run config
+    :type config: RunnableConfig
+    :return: A dictionary with the new "messages", or an empty dictionary when nothing matched
+    """
+    match = _match(state, config)
+    if match is None:
+        return {}
+    if match[0].name in TODO_WRITE_TOOLS:
+        await wait_for_todo_changes(config)
+    return await asyncio.to_thread(_answer, *match)
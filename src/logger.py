@@ -1,13 +1,148 @@
+import atexit
+import glob
+import gzip
 import json
 import os
+import shutil
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
 from datetime import datetime
 
+from metrics import timer
+
 log_file_path = os.environ.get("log_file_path")
 
+# The active segment is `<root>.jsonl` with a `<root>.jsonl.idx` timestamp index next to it. Full
+# segments are rotated to `<root>.<n>.jsonl` (gzipped when enabled) and keep their index.
+_log_root = os.path.splitext(log_file_path)[0]
+LOG_FILE = f"{_log_root}.jsonl"
+LEGACY_LOG_FILE = f"{_log_root}.json"
+
+LOG_MAX_BYTES = int(os.environ.get("log_max_bytes", 10 * 1024 * 1024))
+LOG_COMPRESS = os.environ.get("log_compress") != "False"
+LOG_FSYNC_BATCH = int(os.environ.get("log_fsync_batch", 16))
+LOG_FSYNC_INTERVAL = float(os.environ.get("log_fsync_interval", 1.0))
+
+_lock = threading.Lock()
+_log_file = None
+_index_file = None
+_listeners = []
+_unsynced = 0
+_last_sync = time.monotonic()
+
+
+def _index_path(segment: str) -> str:
+    return segment[:-3] + ".idx" if segment.endswith(".gz") else segment + ".idx"
+
+
+def _open_active():
+    global _log_file, _index_file
+    if _log_file is None:
+        _log_file = open(LOG_FILE, "ab")
+        _index_file = open(_index_path(LOG_FILE), "ab")
+
+
+def _sync():
+    global _unsynced, _last_sync
+    if _log_file is None:
+        return
+    _log_file.flush()
+    _index_file.flush()
+    os.fsync(_log_file.fileno())
+    os.fsync(_index_file.fileno())
+    _unsynced = 0
+    _last_sync = time.monotonic()
+
+
+def _close_active():
+    global _log_file, _index_file
+    if _log_file is None:
+        return
+    _sync()
+    _log_file.close()
+    _index_file.close()
+    _log_file = _index_file = None
+
+
+def _rotated_segments() -> list:
+    """
+    The function `_rotated_segments` lists the rotated log segments, oldest first. Leftover temporary
+    files are skipped, and when a crash left a segment both plain and gzipped, only the plain one is
+    listed, since it is the source the compressed copy was made from.
+
+    :return: A list of paths to rotated segments, sorted by their sequence number
+    """
+    segments = {}
+    for path in glob.glob(f"{glob.escape(_log_root)}.*.jsonl*"):
+        if path.endswith((".idx", ".tmp")):
+            continue
+        number = path[len(_log_root) + 1:].split(".", 1)[0]
+        if number.isdigit() and (int(number) not in segments or not path.endswith(".gz")):
+            segments[int(number)] = path
+    return [segments[number] for number in sorted(segments)]
+
+
+def _segments() -> list:
+    segments = _rotated_segments()
+    if os.path.exists(LOG_FILE):
+        segments.append(LOG_FILE)
+    return segments
+
+
+def _rotate():
+    """
+    The function `_rotate` closes the active segment, renames it with the next sequence number along
+    with its index, and optionally gzips it. The compressed copy is written to a temporary file,
+    fsynced and renamed into place before the plain segment is removed, so a crash never leaves a
+    truncated `.gz` behind.
+    """
+    _close_active()
+    rotated = _rotated_segments()
+    number = int(rotated[-1][len(_log_root) + 1:].split(".", 1)[0]) + 1 if rotated else 1
+    target = f"{_log_root}.{number:05d}.jsonl"
+    os.replace(_index_path(LOG_FILE), _index_path(target))
+    os.replace(LOG_FILE, target)
+    if LOG_COMPRESS:
+        tmp = f"{target}.gz.tmp"
+        with open(target, "rb") as src, open(tmp, "wb") as raw:
+            with gzip.open(raw, "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            raw.flush()
+            os.fsync(raw.fileno())
+        os.replace(tmp, f"{target}.gz")
+        os.remove(target)
+
+
+def _write_entry(entry: dict):
+    """
+    The function `_write_entry` appends one entry to the active segment and its timestamp index,
+    fsyncing in batches and rotating the segment once it exceeds `LOG_MAX_BYTES`. Must be called
+    with `_lock` held.
+
+    :param entry: The log entry with "role", "message" and "timestamp" keys
+    :type entry: dict
+    """
+    global _unsynced
+    _open_active()
+    line = json.dumps(entry, ensure_ascii=False).encode("utf-8") + b"\n"
+    offset = _log_file.tell()
+    _log_file.write(line)
+    _index_file.write(f"{entry['timestamp']}\t{offset}\n".encode("utf-8"))
+    _log_file.flush()
+    _index_file.flush()
+
+    _unsynced += 1
+    if _unsynced >= LOG_FSYNC_BATCH or time.monotonic() - _last_sync >= LOG_FSYNC_INTERVAL:
+        _sync()
+    if offset + len(line) >= LOG_MAX_BYTES:
+        _rotate()
+
 
 def _add_log(role: str, message: str):
     """
-    The function `_add_log` appends a new log entry with role and message to a JSON log file.
+    The function `_add_log` appends a new log entry with role and message to the JSONL log file.
 
     :param role: The `role` parameter in the `_add_log` function is a string that represents the role
     associated with the log message being added. It could be a user role, system role, or any other
@@ -17,23 +152,25 @@ def _add_log(role: str, message: str):
     the log file. It contains information or details that you want to log for a specific role
     :type message: str
     """
-    logs = {"messages": []}
-
-    if os.path.exists(log_file_path):
-        with open(log_file_path, "r", encoding="utf-8") as log_file:
-            try:
-                logs = json.load(log_file)
-            except json.JSONDecodeError:
-                logs = {"messages": []}
-
-    logs["messages"].append({
+    entry = {
         "role": role,
         "message": message,
         "timestamp": datetime.now().isoformat()
-    })
+    }
+    with timer("log_write"), _lock:
+        _write_entry(entry)
+    for listener in _listeners:
+        listener(entry)
 
-    with open(log_file_path, "w", encoding="utf-8") as log_file:
-        json.dump(logs, log_file, indent=2, ensure_ascii=False)
+
+def add_log_listener(listener):
+    """
+    The function `add_log_listener` registers a callable that receives every entry after it has been
+    written, e.g. to keep an index up to date incrementally.
+
+    :param listener: A callable taking the log entry dictionary
+    """
+    _listeners.append(listener)
 
 
 def add_user_log(user_input: str):
@@ -56,12 +193,148 @@ def add_nexus_log(nexus_response: str):
     _add_log("assistant", nexus_response)
 
 
-def get_previous_logs():
-    if os.path.exists(log_file_path):
-        with open(log_file_path, "r", encoding="utf-8") as log_file:
-            try:
-                logs = json.load(log_file)
-                return [{"role": msg["role"], "content": msg["message"]} for msg in logs.get("messages", [])]
-            except json.JSONDecodeError:
-                return []
-    return []
+def _open_segment(path: str):
+    return gzip.open(path, "rb") if path.endswith(".gz") else open(path, "rb")
+
+
+def _read_index(segment: str) -> list:
+    index = []
+    if os.path.exists(_index_path(segment)):
+        with open(_index_path(segment), "r", encoding="utf-8") as index_file:
+            for line in index_file:
+                timestamp, offset = line.rstrip("\n").split("\t")
+                index.append((timestamp, int(offset)))
+    return index
+
+
+def _tail_lines(path: str, count: int) -> list:
+    """
+    The function `_tail_lines` returns the last `count` lines of a segment. Plain segments are read
+    backwards in blocks so only the tail is touched; gzipped segments are streamed.
+
+    :param path: Path to the segment
+    :type path: str
+    :param count: The number of lines wanted
+    :type count: int
+    :return: A list of raw lines, oldest first
+    """
+    if count <= 0:
+        return []
+    if path.endswith(".gz"):
+        with _open_segment(path) as segment:
+            return list(deque(segment, maxlen=count))
+
+    with open(path, "rb") as segment:
+        segment.seek(0, os.SEEK_END)
+        position = segment.tell()
+        data = b""
+        while position > 0 and data.count(b"\n") <= count:
+            step = min(64 * 1024, position)
+            position -= step
+            segment.seek(position)
+            data = segment.read(step) + data
+    lines = data.splitlines(keepends=True)
+    if position > 0:
+        lines = lines[1:]  # the first line may be cut in half
+    return lines[-count:]
+
+
+def iter_logs(since: str = None):
+    """
+    The function `iter_logs` streams log entries oldest first without loading the whole history. When
+    `since` is given, the timestamp indexes are used to seek straight to the first matching entry.
+
+    :param since: An ISO timestamp; only entries logged at or after it are yielded
+    :type since: str
+    :return: A generator of log entry dictionaries
+    """
+    segments = _segments()
+    first_segment, offset = 0, 0
+    if since is not None:
+        for i in reversed(range(len(segments))):
+            index = _read_index(segments[i])
+            if index and index[0][0] <= since:
+                position = bisect_left([timestamp for timestamp, _ in index], since)
+                if position == len(index):
+                    first_segment, offset = i + 1, 0
+                else:
+                    first_segment, offset = i, index[position][1]
+                break
+
+    for i, path in enumerate(segments[first_segment:]):
+        with _open_segment(path) as segment:
+            if i == 0 and offset:
+                segment.seek(offset)
+            for line in segment:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def tail_logs(count: int) -> list:
+    """
+    The function `tail_logs` returns the last `count` log entries, reading segments newest first and
+    stopping as soon as enough entries were found.
+
+    :param count: The number of entries wanted
+    :type count: int
+    :return: A list of log entry dictionaries, oldest first
+    """
+    lines = []
+    for path in reversed(_segments()):
+        lines = _tail_lines(path, count - len(lines)) + lines
+        if len(lines) >= count:
+            break
+    return [json.loads(line) for line in lines if line.strip()]
+
+
+def get_previous_logs(limit: int = None):
+    """
+    The function `get_previous_logs` returns logged messages in `{"role", "content"}` form.
+
+    :param limit: When given, only the last `limit` messages are read
+    :type limit: int
+    :return: A list of message dictionaries, oldest first
+    """
+    entries = iter_logs() if limit is None else tail_logs(limit)
+    return [{"role": entry["role"], "content": entry["message"]} for entry in entries]
+
+
+def migrate_legacy_log():
+    """
+    The function `migrate_legacy_log` converts a `logs.json` file from the old single-document format
+    into the JSONL log. The converted segment is written to a temporary file and renamed into place,
+    and the old file is kept with a `.migrated` suffix.
+    """
+    if not os.path.exists(LEGACY_LOG_FILE) or os.path.exists(LOG_FILE):
+        return
+    with open(LEGACY_LOG_FILE, "r", encoding="utf-8") as legacy_file:
+        try:
+            logs = json.load(legacy_file)
+        except json.JSONDecodeError:
+            logs = {"messages": []}
+
+    tmp_log, tmp_index = f"{LOG_FILE}.tmp", f"{_index_path(LOG_FILE)}.tmp"
+    with open(tmp_log, "wb") as log_file, open(tmp_index, "wb") as index_file:
+        for entry in logs.get("messages", []):
+            offset = log_file.tell()
+            log_file.write(json.dumps(entry, ensure_ascii=False).encode("utf-8") + b"\n")
+            index_file.write(f"{entry['timestamp']}\t{offset}\n".encode("utf-8"))
+        log_file.flush()
+        index_file.flush()
+        os.fsync(log_file.fileno())
+        os.fsync(index_file.fileno())
+    os.replace(tmp_index, _index_path(LOG_FILE))
+    os.replace(tmp_log, LOG_FILE)
+    os.replace(LEGACY_LOG_FILE, f"{LEGACY_LOG_FILE}.migrated")
+
+
+def close_log():
+    """
+    The function `close_log` flushes and fsyncs any batched writes and closes the active segment.
+    """
+    with _lock:
+        _close_active()
+
+
+migrate_legacy_log()
+atexit.register(close_log)
@@ -0,0 +1,208 @@
+import json
+import os
+import re
+import threading
+import zlib
+from collections import Counter
+
+import numpy as np
+
+from utils import nexus_file
+
+RECALL_TOP_K = int(os.environ.get("recall_top_k", 3))
+RECALL_MIN_SCORE = float(os.environ.get("recall_min_score", 0.3))
+
+# Width of the hashed feature vectors; changing it needs a fresh index
+DIM = 1024
+_MAX_RECALL_CHARS = 400
+# Candidates taken from the hashed vectors per wanted result, then rescored on their actual words
+_SHORTLIST = 4
+
+_word = re.compile(r"[a-z0-9']+")
+_stopwords = frozenset(
+    "a an and are as at be but by can could do does for from had has have how i i'm in is it it's "
+    "me my of on or please so that the their there this to was we what when where which who why "
+    "will with would you your".split()
+)
+
+
+def features(text: str) -> list:
+    """
+    The function `features` splits text into the words and word pairs that are compared.
+
+    :param text: The text to split
+    :type text: str
+    :return: A list of features
+    """
+    words = [word for word in _word.findall(text.lower()) if word not in _stopwords]
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+def similarity(a: Counter, b: Counter) -> float:
+    dot = sum(count * b[feature] for feature, count in a.items())
+    norm = np.sqrt(sum(c * c for c in a.values()) * sum(c * c for c in b.values()))
+    return dot / norm if norm else 0.0
+
+
+def embed(text: str) -> np.ndarray:
+    """
+    The function `embed` turns text into a unit-length hashed bag of words and word pairs. It needs
+    no model, and similar wording gives a high dot product.
+
+    :param text: The text to embed
+    :type text: str
+    :return: A float32 vector of length `DIM`
+    """
+    vector = np.zeros(DIM, dtype=np.float32)
+    for feature in features(text):
+        h = zlib.crc32(feature.encode("utf-8"))
+        # The top bit picks the sign, so unrelated features cancel out instead of piling up
+        vector[h % DIM] += -1.0 if h & 0x80000000 else 1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class MemoryIndex:
+    """
+    An append-only index of past exchanges (a user turn and the reply to it). Vectors live in a flat
+    float32 file that is memory-mapped for search, so neither start-up nor a lookup reads the
+    conversation history itself; the text of an exchange is only read when it is recalled.
+
+    Files: `<path>.f32` (vectors), `<path>.off` (int64 offsets into the text file) and `<path>.jsonl`.
+    """
+
+    def __init__(self, path: str):
+        self.vector_path = f"{path}.f32"
+        self.offset_path = f"{path}.off"
+        self.text_path = f"{path}.jsonl"
+        self.lock = threading.Lock()
+        self.pending_user = None
+        self.vectors = None  # memmap over the first `mapped` vectors
+        self.mapped = 0
+        self.count = self._stored_count()
+
+    def _stored_count(self) -> int:
+        sizes = [os.path.getsize(path) // width if os.path.exists(path) else 0
+                 for path, width in ((self.vector_path, DIM * 4), (self.offset_path, 8))]
+        # A crash between the appends leaves the files one entry apart; the shorter one wins
+        return min(sizes)
+
+    def add(self, user: str, assistant: str, timestamp: str):
+        """
+        The function `add` appends one exchange to the index.
+
+        :param user: What the user said
+        :type user: str
+        :param assistant: What the assistant replied
+        :type assistant: str
+        :param timestamp: When the exchange happened, as an ISO timestamp
+        :type timestamp: str
+        """
+        vector = embed(f"{user}\n{assistant}")
+        line = json.dumps({"timestamp": timestamp, "user": user, "assistant": assistant},
+                          ensure_ascii=False).encode("utf-8") + b"\n"
+        with self.lock:
+            with open(self.text_path, "ab") as text_file:
+                offset = text_file.tell()
+                text_file.write(line)
+            # Drop a half-written entry left by a crash so every file stays aligned on `count`
+            for path, width in ((self.offset_path, 8), (self.vector_path, DIM * 4)):
+                if os.path.exists(path) and os.path.getsize(path) != self.count * width:
+                    os.truncate(path, self.count * width)
+            with open(self.offset_path, "ab") as offset_file:
+                offset_file.write(np.int64(offset).tobytes())
+            with open(self.vector_path, "ab") as vector_file:
+                vector_file.write(vector.tobytes())
+            self.count += 1
+
+    def observe(self, entry: dict):
+        """
+        The function `observe` is a log listener: it pairs each logged user turn with the reply logged
+        after it and indexes the pair.
+
+        :param entry: A log entry with "role", "message" and "timestamp" keys
+        :type entry: dict
+        """
+        if entry["role"] == "user":
+            self.pending_user = entry
+        elif entry["role"] == "assistant" and self.pending_user is not None:
+            user, self.pending_user = self.pending_user, None
+            self.add(user["message"], entry["message"], user["timestamp"])
+
+    def build(self, entries) -> int:
+        """
+        The function `build` indexes a stream of log entries, e.g. to backfill the index from the log.
+
+        :param entries: An iterable of log entries, oldest first
+        :return: The number of exchanges in the index afterwards
+        """
+        for entry in entries:
+            self.observe(entry)
+        self.pending_user = None
+        return self.count
+
+    def search(self, query: str, k: int = RECALL_TOP_K, min_score: float = RECALL_MIN_SCORE,
+               exclude=()) -> list:
+        """
+        The function `search` finds the past exchanges most similar to a query. The hashed vectors
+        pick a shortlist, which is rescored on the exact features so hash collisions never decide a
+        match.
+
+        :param query: The text to look up, usually the latest user turn
+        :type query: str
+        :param k: How many exchanges to return at most
+        :type k: int
+        :param min_score: The lowest cosine similarity worth returning
+        :type min_score: float
+        :param exclude: User turns to skip, e.g. the ones still in the prompt
+        :return: A list of exchange dictionaries with a "score" key, best first
+        """
+        query_features = Counter(features(query))
+        vector = embed(query)
+        with self.lock:
+            if not self.count or not vector.any():
+                return []
+            if self.mapped != self.count:
+                self.vectors = np.memmap(self.vector_path, dtype=np.float32, mode="r", shape=(self.count, DIM))
+                self.mapped = self.count
+            scores = self.vectors @ vector
+        wanted = min(len(scores), _SHORTLIST * k + len(exclude))
+        shortlist = np.argpartition(-scores, wanted - 1)[:wanted]
+        found = []
+        for i in shortlist:
+            if scores[i] <= 0:
+                continue
+            exchange = self._read(int(i))
+            if exchange["user"] in exclude:
+                continue
+            score = similarity(query_features, Counter(features(f"{exchange['user']}\n{exchange['assistant']}")))
+            if score >= min_score:
+                found.append({**exchange, "score": score})
+        found.sort(key=lambda exchange: -exchange["score"])
+        return found[:k]
+
+    def _read(self, i: int) -> dict:
+        with open(self.offset_path, "rb") as offset_file:
+            offset_file.seek(i * 8)
+            offset = int(np.frombuffer(offset_file.read(8), dtype=np.int64)[0])
+        with open(self.text_path, "rb") as text_file:
+            text_file.seek(offset)
+            return json.loads(text_file.readline())
+
+
+def format_recalled(exchanges: list) -> str:
+    """
+    The function `format_recalled` renders recalled exchanges for the system prompt.
+
+    :param exchanges: Results of `MemoryIndex.search`
+    :type exchanges: list
+    :return: The exchanges as text, or an empty string
+    """
+    lines = []
+    for exchange in exchanges:
+        lines.append(f"- ({exchange['timestamp'][:10]}) User: {exchange['user'][:_MAX_RECALL_CHARS]}"
+                     f" | You: {exchange['assistant'][:_MAX_RECALL_CHARS]}")
+    return "\n".join(lines)
+
+
+memory_index = MemoryIndex(nexus_file("memory_index"))
@@ -0,0 +1,217 @@
+import atexit
+import contextvars
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from uuid import uuid4
+
+# Everything below is a no-op unless `metrics_enabled` is set, so instrumentation can stay in hot paths
+METRICS_ENABLED = os.environ.get("metrics_enabled") == "True"
+METRICS_PORT = int(os.environ.get("metrics_port", 0))
+METRICS_INTERVAL = float(os.environ.get("metrics_interval", 10))
+RESERVOIR_SIZE = 2048  # most recent samples kept per stage for percentiles
+
+# The id of the voice turn being processed, carried across threads with each segment
+trace_id = contextvars.ContextVar("trace_id", default=None)
+
+_lock = threading.Lock()
+_histograms = {}
+_counters = defaultdict(float)
+_gauges = {}
+_collectors = []
+_trace_events = []
+
+
+class Histogram:
+    """
+    Keeps a count, a running sum and a bounded reservoir of recent samples for percentiles.
+    """
+
+    def __init__(self):
+        self.samples = deque(maxlen=RESERVOIR_SIZE)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.samples.append(value)
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def observe(stage: str, seconds: float):
+    """
+    The function `observe` records the duration of one run of a pipeline stage, tagged with the
+    current trace id.
+
+    :param stage: The stage name, e.g. "stt" or "tool:get_weather"
+    :type stage: str
+    :param seconds: The measured duration in seconds
+    :type seconds: float
+    """
+    if not METRICS_ENABLED:
+        return
+    with _lock:
+        _histograms.setdefault(stage, Histogram()).observe(seconds)
+        trace = trace_id.get()
+        if trace is not None:
+            _trace_events.append({"trace": trace, "stage": stage, "ms": round(seconds * 1000, 3),
+                                  "at": time.time()})
+
+
+def inc(name: str, value: float = 1):
+    if METRICS_ENABLED:
+        with _lock:
+            _counters[name] += value
+
+
+def set_gauge(name: str, value: float):
+    if METRICS_ENABLED:
+        _gauges[name] = value
+
+
+def register_collector(collect):
+    """
+    The function `register_collector` adds a callable returning `{name: value}` gauges that are read
+    only when metrics are exported, e.g. cache or intent hit counters kept elsewhere.
+
+    :param collect: A callable with no arguments returning a dictionary of gauge values
+    """
+    if METRICS_ENABLED:
+        _collectors.append(collect)
+
+
+def new_trace_id() -> str:
+    """
+    The function `new_trace_id` creates the id of a new turn trace. Stages join the trace by setting
+    `trace_id` in the thread that handles the turn.
+
+    :return: The new trace id
+    """
+    return uuid4().hex[:16]
+
+
+class _Timer:
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.stage, time.perf_counter() - self.start)
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def timer(stage: str):
+    """
+    The function `timer` returns a context manager that records how long its block took.
+
+    :param stage: The stage name
+    :type stage: str
+    :return: A context manager, shared and free of work when metrics are disabled
+    """
+    return _Timer(stage) if METRICS_ENABLED else _NULL_TIMER
+
+
+def render() -> str:
+    """
+    The function `render` formats every metric in the Prometheus text exposition format.
+
+    :return: The metrics as text
+    """
+    lines = ["# TYPE nexus_stage_seconds summary"]
+    with _lock:
+        for stage, histogram in sorted(_histograms.items()):
+            for q in (0.5, 0.95, 0.99):
+                lines.append(f'nexus_stage_seconds{{stage="{stage}",quantile="{q}"}} {histogram.quantile(q):.6f}')
+            lines.append(f'nexus_stage_seconds_count{{stage="{stage}"}} {histogram.count}')
+            lines.append(f'nexus_stage_seconds_sum{{stage="{stage}"}} {histogram.sum:.6f}')
+        for name, value in sorted(_counters.items()):
+            lines.append(f"# TYPE nexus_{name}_total counter")
+            lines.append(f"nexus_{name}_total {value}")
+    gauges = dict(_gauges)
+    for collect in _collectors:
+        gauges.update(collect())
+    for name, value in sorted(gauges.items()):
+        lines.append(f"# TYPE nexus_{name} gauge")
+        lines.append(f"nexus_{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def write_metrics(metrics_file: str, trace_file: str):
+    """
+    The function `write_metrics` writes the current metrics to `metrics_file` and appends pending
+    per-turn trace events to `trace_file` as JSON lines.
+    """
+    global _trace_events
+    with _lock:
+        events, _trace_events = _trace_events, []
+    if events:
+        with open(trace_file, "a", encoding="utf-8") as f:
+            f.writelines(json.dumps(event) + "\n" for event in events)
+    tmp_file = f"{metrics_file}.tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        f.write(render())
+    os.replace(tmp_file, metrics_file)
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_exporter(metrics_file: str, trace_file: str):
+    """
+    The function `start_exporter` periodically writes metrics and traces to local files and, when
+    `metrics_port` is set, serves them on `http://127.0.0.1:<port>/metrics`.
+
+    :param metrics_file: Path of the Prometheus text file
+    :type metrics_file: str
+    :param trace_file: Path of the JSONL trace file
+    :type trace_file: str
+    """
+    if not METRICS_ENABLED:
+        return
+
+    def export():
+        while True:
+            time.sleep(METRICS_INTERVAL)
+            write_metrics(metrics_file, trace_file)
+
+    threading.Thread(target=export, daemon=True).start()
+    atexit.register(write_metrics, metrics_file, trace_file)
+    if METRICS_PORT:
+        server = ThreadingHTTPServer(("127.0.0.1", METRICS_PORT), _MetricsRequestHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
@@ -0,0 +1,143 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import date
+
+from utils import nexus_file
+
+RESPONSE_CACHE_ENABLED = os.environ.get("response_cache_enabled") == "True"
+RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get("response_cache_max_entries", 256))
+
+# How long an answer stays valid, by the tool it was based on. Only answers to a query that names the
+# lookup itself (e.g. "what's the weather in Paris") are cached; anything else, such as "what about
+# Paris?", depends on the conversation around it. Answers are keyed by the whole normalized query, so
+# "write a poem about the weather in Paris" never gets the weather report, or the other way round.
+TOOL_TTLS = {
+    "get_weather": float(os.environ.get("weather_cache_ttl", 600)),
+    "get_news": float(os.environ.get("news_cache_ttl", 1800)),
+}
+
+_lock = threading.Lock()
+_conn = None
+
+
+def _db() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        _conn = sqlite3.connect(nexus_file("response_cache.sqlite"), check_same_thread=False, isolation_level=None)
+        _conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                query TEXT NOT NULL,
+                answer TEXT NOT NULL,
+                tools TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS responses_last_used ON responses(last_used);
+        """)
+    return _conn
+
+
+def _normalize_args(args: dict) -> dict:
+    return {name: " ".join(str(value).lower().split()) for name, value in args.items()}
+
+
+def lookup_for(query: str):
+    """
+    The function `lookup_for` finds the tool call a query asks for in its own words, so that an answer is
+    only cached when the query alone decides which lookup it needs.
+
+    :param query: The user's transcript
+    :type query: str
+    :return: A tuple `(tool_name, args)` with normalized arguments, or None
+    """
+    from intents import match_prefetch
+    match = match_prefetch(query)
+    if match is None or match[0].name not in TOOL_TTLS:
+        return None
+    return match[0].name, _normalize_args(match[1])
+
+
+def cache_key(query: str):
+    """
+    The function `cache_key` turns a transcript into a cache key: the current day, the tool call it
+    asks for with its arguments, and the normalized transcript itself.
+
+    :param query: The user's transcript
+    :type query: str
+    :return: The key, or None if the query must not be cached
+    """
+    lookup = lookup_for(query)
+    if lookup is None:
+        return None
+    from intents import normalize
+    name, args = lookup
+    return f"{date.today().isoformat()}|{name}|{json.dumps(args, sort_keys=True)}|{normalize(query)}"
+
+
+def get(query: str):
+    """
+    The function `get` returns a cached answer for the query if there is one that has not expired.
+
+    :param query: The user's transcript
+    :type query: str
+    :return: The cached answer, or None
+    """
+    key = cache_key(query) if RESPONSE_CACHE_ENABLED else None
+    if key is None:
+        return None
+    now = time.time()
+    with _lock:
+        row = _db().execute("SELECT answer, expires_at FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        if row[1] <= now:
+            _db().execute("DELETE FROM responses WHERE key = ?", (key,))
+            return None
+        _db().execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+    return row[0]
+
+
+def put(query: str, answer: str, tool_calls: list):
+    """
+    The function `put` caches an answer when the turn made exactly the lookup the query asks for and
+    the tool kept a result for it, evicting the least recently used answers beyond
+    `RESPONSE_CACHE_MAX_ENTRIES`. Answers built on a failed lookup are not cached, since the tool
+    did not keep a result.
+
+    :param query: The user's transcript
+    :type query: str
+    :param answer: The final answer given
+    :type answer: str
+    :param tool_calls: The tool calls made while answering, as dicts with "name" and "args"
+    :type tool_calls: list
+    """
+    key = cache_key(query) if RESPONSE_CACHE_ENABLED else None
+    if key is None or not tool_calls:
+        return
+    from tools import has_cached_result
+    name, args = lookup_for(query)
+    if any(call["name"] != name or _normalize_args(call["args"]) != args for call in tool_calls):
+        return
+    if not has_cached_result(name, args):
+        return
+    ttl = TOOL_TTLS[name]
+    if ttl <= 0:
+        return
+    now = time.time()
+    with _lock:
+        db = _db()
+        db.execute("INSERT OR REPLACE INTO responses (key, query, answer, tools, expires_at, last_used) "
+                   "VALUES (?, ?, ?, ?, ?, ?)", (key, query, answer, name, now + ttl, now))
+        db.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+        db.execute("DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY last_used DESC "
+                   "LIMIT -1 OFFSET ?)", (RESPONSE_CACHE_MAX_ENTRIES,))
+
+
+def clear():
+    with _lock:
+        _db().execute("DELETE FROM responses")
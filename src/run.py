@@ -1,265 +1,774 @@
-
-
+import asyncio
 import time
-import torch
+from concurrent.futures import ThreadPoolExecutor
 import sounddevice as sd
-import numpy as np
-from queue import Queue, Empty
-from utils import listen_to_keyboard
-import pyttsx3
+from utils import listen_to_keyboard, nexus_file
 import speech_recognition as sr
-from langsmith import traceable
-from progress.bar import ChargingBar
 from uuid import uuid4
-import threading
 import os
-from logger import add_user_log, add_nexus_log, get_previous_logs
-from chatbot import nexus
-from silero_vad import load_silero_vad, read_audio, get_speech_timestamps
-
-# Globals
-r = sr.Recognizer()
-exit_event = threading.Event()
-
-# Load Silero VAD model once
-vad_model = load_silero_vad()
+from logger import add_user_log, add_nexus_log, add_log_listener, get_previous_logs, iter_logs
+from long_term_memory import memory_index
+from vad import MIN_SEGMENT_ENERGY, VAD_SETTINGS, CaptureBuffer, StreamingVAD, segment_energy
+from tts import SentenceBuffer, TTSWorker
+from stt import RecognizerPool, load_stt_backend
+from startup import Lazy, preload
+from wake_word import WAKE_WORD_ENABLED, WAKE_WORD_WINDOW
+import metrics
+import response_cache
+
+# Phrases the assistant says often enough to be worth rendering once
+FIXED_PHRASES = [
+    "Sorry, I didn't catch that.",
+    "Speech recognition failed.",
+    "An error occurred."
+]
+tts = TTSWorker(prerender=FIXED_PHRASES, cache_dir=nexus_file("tts_cache"))
+
+
+def _load_vad_model():
+    from silero_vad import load_silero_vad
+    return load_silero_vad()
+
+
+def _load_graph():
+    import chatbot
+    # Build the model client too, so the first turn does not pay for it
+    chatbot.llm_with_tools.get()
+    return chatbot
+
+
+def _load_spotter():
+    from wake_word import KeywordSpotter, load_templates
+    # Recordings of the user saying the name work best; the name rendered by the TTS is the fallback
+    templates = load_templates(nexus_file("wake_word"), SAMPLE_RATE,
+                               render=lambda: tts.render(os.environ.get("name")).result())
+    return KeywordSpotter(templates, SAMPLE_RATE)
+
+
+def _load_traced_turn():
+    from langsmith import traceable
+    return traceable(name="stream_graph_updates")(VoiceLoop._respond)
+
+
+# Heavy components are built on first use, or all at once in the background by `warm_up`, so the mic
+# listener can start before torch, langchain or the models are loaded
+vad_model = Lazy("vad_model", _load_vad_model)
+stt_backend = Lazy("stt_backend", load_stt_backend)
+graph = Lazy("graph", _load_graph)
+traced_turn = Lazy("traced_turn", _load_traced_turn)
+spotter = Lazy("wake_word", _load_spotter)
 
 # Audio settings
 SAMPLE_RATE = 16000
 CHANNELS = 1
 CHUNK_DURATION = 0.5  # seconds per audio chunk to process
+CAPTURE_SECONDS = 10  # audio the capture ring holds while the listener is busy (e.g. loading the VAD)
+
+# Stage queues are bounded, so a slow stage holds back the one before it instead of piling up work.
+# Audio blocks waiting for the VAD are views into the capture ring, released once the VAD has run.
+AUDIO_QUEUE_SIZE = 8
+SEGMENT_QUEUE_SIZE = 4
+TRANSCRIPT_QUEUE_SIZE = 4
+
+# Speech over the assistant interrupts it once it lasts this long and is this loud, which keeps the
+# assistant's own voice coming back through the mic from cutting it off
+BARGE_IN_ENABLED = os.environ.get("barge_in_enabled") != "False"
+BARGE_IN_MIN_SAMPLES = int(SAMPLE_RATE * float(os.environ.get("barge_in_min_ms", 300)) / 1000)
+BARGE_IN_MIN_ENERGY = float(os.environ.get("barge_in_min_energy", 0.03))
+
+# Partial transcripts: the speech so far is recognized every `partial_interval_ms` to prefetch tool
+# results, and once more when the user pauses for `speculation_silence_ms`, which starts the turn on
+# that transcript while the VAD is still waiting to see whether the pause ends the utterance
+PARTIALS_ENABLED = os.environ.get("partial_transcripts_enabled") == "True"
+PARTIAL_INTERVAL_SAMPLES = int(SAMPLE_RATE * float(os.environ.get("partial_interval_ms", 1000)) / 1000)
+SPECULATION_SILENCE_SAMPLES = int(SAMPLE_RATE * float(os.environ.get("speculation_silence_ms", 200)) / 1000)
+
+# Speech recognition runs on worker threads fed by the VAD segment stream
+recognizer_pool = RecognizerPool(stt_backend, SAMPLE_RATE, workers=int(os.environ.get("stt_workers", 2)))
+
+
+def warm_up():
+    """
+    The function `warm_up` starts loading the VAD model, the STT backend, the graph and, when enabled,
+    the wake word spotter in parallel in the background.
+    """
+    preload(vad_model, stt_backend, graph, traced_turn, *([spotter] if WAKE_WORD_ENABLED else []))
 
 
 def speakText(command):
     """
     The function `speakText` takes a command as input, prints it with "Assistant: " prefix, and then
-    uses pyttsx3 library to speak out the command.
+    queues it on the TTS worker without waiting for playback.
 
     :param command: The `command` parameter in the `speakText` function is a string that represents the
     text that you want the assistant to speak out loud
     """
     print(f"{os.environ.get('name')}: ", command)
-    engine = pyttsx3.init()
-    engine.say(command)
-    engine.runAndWait()
+    tts.say(command)
+
+
+# A stable thread id lets the persistent checkpointer pick up where the last session ended
+retain_memory = os.environ.get("retain_memory") != "False"
+if retain_memory:
+    thread_id = os.environ.get("thread_id")
+else:
+    thread_id = str(uuid4())
+config = {"configurable": {"thread_id": thread_id, "long_term_memory": retain_memory}}
+# Logged messages imported into a thread that has no state yet, e.g. after upgrading from log replay
+HISTORY_IMPORT_MESSAGES = int(os.environ.get("history_import_messages", 20))
+
+
+def _chunk_text(chunk) -> str:
+    if isinstance(chunk.content, str):
+        return chunk.content
+    return "".join(
+        part if isinstance(part, str) else part.get("text", "")
+        for part in chunk.content
+    )
+
 
+class Speculation:
+    """
+    The transcript of everything said up to a pause, recognized before the VAD decides whether the
+    pause ends the utterance, and the turn started on it. The turn runs but stays silent, and holds
+    back any change to the to-do list, until the utterance ends without more speech, which confirms the
+    transcript; if the user goes on talking, the turn is cancelled and its changes to the conversation
+    are rolled back.
+    """
 
-thread_id = str(uuid4())
-config = {"configurable": {"thread_id": thread_id}}
+    def __init__(self, speech_start: int, speech_end: int, transcript: asyncio.Future):
+        self.speech_start = speech_start
+        self.speech_end = speech_end
+        self.transcript = transcript
+        self.confirmed = asyncio.Event()
+        self.discarded = False
+        self.task = None  # the turn started on the transcript, if nothing else was in progress
 
 
-@traceable
-def stream_graph_updates(user_input: str):
+class VoiceLoop:
+    """
+    The voice assistant as a single asyncio runtime. Each stage is a task that feeds the next through a
+    bounded queue: capture -> VAD -> STT -> turn, with the turn handing sentences to the TTS worker.
+    Silero, speech recognition and file I/O run on executors and playback on the TTS thread, so
+    neither a long turn nor tool I/O stalls audio capture, and utterances spoken during a turn are
+    recognized while it runs. Speech over a running turn cancels it (barge-in); quitting cancels every
+    stage. With `partial_transcripts_enabled`, speech is also recognized while it is still going on,
+    to prefetch tool results and to start the turn during the pause that ends it.
     """
-    The function `stream_graph_updates` processes user input, interacts with a Nexus service, and
-    provides an assistant response.
 
-    :param user_input: The `user_input` parameter in the `stream_graph_updates` function is a string
-    that represents the input provided by the user. This input is then processed by the function to
-    generate a response from the coding assistant
-    :type user_input: str
+    def __init__(self, config: dict, nexus=None):
+        self.config = config
+        self.nexus = nexus
+        self.conn = None
+        self.audio = asyncio.Queue(maxsize=AUDIO_QUEUE_SIZE)
+        self.segments = asyncio.Queue(maxsize=SEGMENT_QUEUE_SIZE)
+        self.transcripts = asyncio.Queue(maxsize=TRANSCRIPT_QUEUE_SIZE)
+        self.audio_ready = asyncio.Event()
+        self.turn = None  # the task answering the latest transcript
+        self.barged_in = False
+        self.handling = False  # whether `converse` is busy with a transcript
+        self.speculation = None  # the latest `Speculation` not yet attached to a segment
+        self.rollback = None  # the discarded speculative turn, while it rolls back
+        self.partial = None  # the task recognizing the speech so far
+        self.partial_at = 0  # absolute sample the latest partial transcript ran up to
+        self.prefetch_candidate = None
+        # Silero keeps recurrent state, so the VAD and the wake word spotter run in order on one thread
+        self.vad_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="vad")
+
+    async def run(self):
+        """
+        The function `run` listens until "q" is pressed, a quit command is spoken or a stage fails, then
+        cancels every stage and closes the microphone.
+        """
+        loop = asyncio.get_running_loop()
+        print("Starting mic listener...")
+        with open_mic(on_write=lambda: loop.call_soon_threadsafe(self.audio_ready.set)):
+            stages = [asyncio.create_task(stage) for stage in (
+                self.capture(), self.detect_speech(), self.recognize(), self.converse(), listen_to_keyboard()
+            )]
+            try:
+                await asyncio.wait(stages, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                for stage in stages:
+                    stage.cancel()
+                await asyncio.gather(*stages, return_exceptions=True)
+                if self.speculation is not None:
+                    self.discard_speculation()
+                if self.rollback is not None:
+                    await asyncio.gather(self.rollback, return_exceptions=True)
+                self.vad_executor.shutdown(wait=False, cancel_futures=True)
+                await self.close()
+        for stage in stages:
+            if not stage.cancelled() and stage.exception() is not None:
+                raise stage.exception()
+
+    async def open_graph(self):
+        """
+        The function `open_graph` waits for the graph to load and compiles it against an async
+        checkpointer on the shared checkpoint file, the same way the gateway does.
+        """
+        import aiosqlite
+        from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+        chatbot = await asyncio.to_thread(graph.get)
+        self.conn = await aiosqlite.connect(nexus_file("checkpoints.sqlite"))
+        self.nexus = chatbot.compile_nexus(AsyncSqliteSaver(self.conn, serde=chatbot.checkpoint_store.serializer))
+
+    async def close(self):
+        if self.conn is not None:
+            await self.conn.close()
+            self.conn = None
+
+    async def capture(self):
+        """
+        The function `capture` hands the audio written by the sounddevice callback to the VAD stage, as
+        views into the capture ring.
+        """
+        while True:
+            await self.audio_ready.wait()
+            self.audio_ready.clear()
+            for view in capture.views(timeout=0):
+                await self.audio.put(view)
+            metrics.set_gauge("capture_overruns", capture.overruns)
+            metrics.set_gauge("audio_queue_depth", self.audio.qsize())
+
+    async def detect_speech(self):
+        """
+        The function `detect_speech` streams the audio through Silero VAD and queues each completed
+        speech segment for recognition. With `wake_word_enabled`, audio only reaches the VAD for
+        `wake_word_window` seconds after the wake word, extended by every segment heard and while the
+        assistant is speaking. Speech that starts while a turn is running interrupts it (barge-in), and
+        is then recognized like any other segment. A segment that ends where a speculation paused
+        carries it, and is not recognized again.
+        """
+        loop = asyncio.get_running_loop()
+        # Capture starts right away; audio queues up until the VAD model has finished loading
+        vad = await asyncio.to_thread(lambda: StreamingVAD(vad_model.get(), sampling_rate=SAMPLE_RATE, **VAD_SETTINGS))
+        wake_word = await asyncio.to_thread(spotter.get) if WAKE_WORD_ENABLED else None
+        listening_until = 0.0
+        barged_in_at = None  # start of the speech that interrupted the last turn
+        while True:
+            data = await self.audio.get()
+            if wake_word is not None:
+                if tts.is_busy():
+                    listening_until = max(listening_until, time.monotonic() + WAKE_WORD_WINDOW)
+                if not vad.in_speech and time.monotonic() >= listening_until:
+                    if not await loop.run_in_executor(self.vad_executor, wake_word.process, data):
+                        capture.release(len(data))
+                        metrics.set_gauge("wake_word_listening", 0)
+                        continue
+                    # The chunk with the wake word goes to the VAD too, for a command said in one go
+                    metrics.inc("wake_words")
+                    metrics.set_gauge("wake_word_listening", 1)
+                    vad.reset()
+                    listening_until = time.monotonic() + WAKE_WORD_WINDOW
+
+            with metrics.timer("vad"):
+                segments = await loop.run_in_executor(self.vad_executor, vad.process, data)
+            # The VAD keeps its own copy, so the capture ring can reuse this audio
+            capture.release(len(data))
+            metrics.set_gauge("vad_speech_samples", vad.processed - vad.speech_start if vad.in_speech else 0)
+            if BARGE_IN_ENABLED and self._is_barge_in(vad, barged_in_at):
+                barged_in_at = vad.speech_start
+                self.interrupt()
+            if PARTIALS_ENABLED:
+                self._follow_speech(vad, segments)
+
+            for segment in segments:
+                speech_np = segment["audio"]
+
+                # Playback does not block capture, so drop segments that overlap our own voice,
+                # unless the user talked over it on purpose
+                if segment["start"] != barged_in_at and tts.spoke_since(
+                        time.monotonic() - len(speech_np) / SAMPLE_RATE):
+                    continue
+
+                # Skip weak detections to avoid processing background noise
+                segment["energy"] = segment_energy(speech_np)
+                if segment["energy"] <= MIN_SEGMENT_ENERGY:
+                    continue
+
+                segment["trace_id"] = metrics.new_trace_id()
+                if self.speculation is not None and self.speculation.speech_start == segment["start"]:
+                    segment["speculation"], self.speculation = self.speculation, None
+                await self.segments.put(segment)
+                listening_until = time.monotonic() + WAKE_WORD_WINDOW
+
+    def _is_barge_in(self, vad: StreamingVAD, barged_in_at) -> bool:
+        """
+        The function `_is_barge_in` tells whether the speech the VAD is in the middle of should
+        interrupt the running turn: it must not have interrupted it already, and be long and loud
+        enough to be the user rather than the assistant's own voice.
+
+        :param vad: The VAD stage's `StreamingVAD`
+        :type vad: StreamingVAD
+        :param barged_in_at: Start of the speech that caused the last barge-in, or None
+        :return: True if the turn should be interrupted now
+        """
+        if not vad.in_speech or vad.speech_start == barged_in_at or self.barged_in:
+            return False
+        if self.turn is None or self.turn.done():
+            return False
+        if vad.processed - vad.speech_start < BARGE_IN_MIN_SAMPLES:
+            return False
+        return segment_energy(vad.ring.read(vad.speech_start, vad.processed)) > BARGE_IN_MIN_ENERGY
+
+    def _follow_speech(self, vad: StreamingVAD, segments: list):
+        """
+        The function `_follow_speech` starts partial recognition of the speech the VAD is in the middle
+        of: every `partial_interval_ms` while the user talks, and once when they pause for
+        `speculation_silence_ms`. It discards the speculation when the user went on talking after the
+        pause it was made on.
+
+        :param vad: The VAD stage's `StreamingVAD`
+        :type vad: StreamingVAD
+        :param segments: The segments that ended in the latest chunk
+        :type segments: list
+        """
+        speculation = self.speculation
+        if speculation is not None and not any(segment["start"] == speculation.speech_start for segment in segments):
+            if not (vad.speech_start == speculation.speech_start and vad.silence_start == speculation.speech_end):
+                self.discard_speculation()
+        if not vad.in_speech:
+            return
+
+        silence_start = vad.silence_start
+        if silence_start is not None:
+            if self.speculation is None and vad.processed - silence_start >= SPECULATION_SILENCE_SAMPLES:
+                audio = vad.ring.read(vad.speech_start, silence_start)
+                transcript = asyncio.wrap_future(recognizer_pool.submit({"audio": audio, "trace_id": None}))
+                self.speculation = Speculation(vad.speech_start, silence_start, transcript)
+                transcript.add_done_callback(lambda _, speculation=self.speculation: self._speculate(speculation))
+        elif (self.partial is None or self.partial.done()) and \
+                vad.processed - max(self.partial_at, vad.speech_start) >= PARTIAL_INTERVAL_SAMPLES:
+            self.partial_at = vad.processed
+            self.partial = asyncio.create_task(self._prefetch(vad.ring.read(vad.speech_start, vad.processed)))
+
+    async def _prefetch(self, audio):
+        """
+        The function `_prefetch` recognizes the speech so far and, once two partial transcripts in a
+        row ask for the same lookup (e.g. the weather in one city), runs it so that its result is
+        cached by the time the turn calls the tool. A prefetch that turns out to be wrong costs one
+        lookup and expires with the tool cache.
+
+        :param audio: The int16 speech so far
+        """
+        try:
+            text = await asyncio.wrap_future(recognizer_pool.submit({"audio": audio, "trace_id": None}))
+        except (sr.UnknownValueError, sr.RequestError):
+            return
+        metrics.inc("partial_transcripts")
+        from intents import match_prefetch
+        match = await asyncio.to_thread(match_prefetch, text)
+        if match is None:
+            return
+        tool, args = match
+        candidate = (tool.name, tuple(sorted(args.items())))
+        if candidate != self.prefetch_candidate:
+            self.prefetch_candidate = candidate
+            return
+        self.prefetch_candidate = None
+        metrics.inc("tool_prefetches")
+        try:
+            await asyncio.to_thread(tool.invoke, args)
+        except Exception:
+            pass  # the turn calls the tool again and handles the error there
+
+    def _speculate(self, speculation: Speculation):
+        """
+        The function `_speculate` starts the turn on a speculation's transcript, unless the speculation
+        was discarded meanwhile or an earlier utterance is still in progress.
+
+        :param speculation: A speculation whose transcript just finished
+        :type speculation: Speculation
+        """
+        if speculation.discarded or speculation.transcript.cancelled() or speculation.transcript.exception():
+            return
+        text = speculation.transcript.result().lower()
+        if text in ["quit", "exit", "q"] or self.nexus is None or self.handling or (self.rollback is not None and not self.rollback.done()):
+            return
+        if (self.turn is not None and not self.turn.done()) or not self.segments.empty() or not self.transcripts.empty():
+            return
+        speculation.task = asyncio.create_task(self.respond(text, speculation))
+        metrics.inc("speculative_turns")
+
+    def discard_speculation(self):
+        """
+        The function `discard_speculation` drops the latest speculation and cancels its turn, which then
+        rolls back whatever it added to the conversation.
+        """
+        speculation, self.speculation = self.speculation, None
+        speculation.discarded = True
+        speculation.transcript.cancel()
+        if speculation.task is not None:
+            speculation.task.cancel()
+            self.rollback = speculation.task
+        metrics.inc("speculations_discarded")
+
+    def interrupt(self):
+        """
+        The function `interrupt` stops playback at the current word and cancels the running turn, which
+        then keeps only what was already said.
+        """
+        self.barged_in = True
+        tts.interrupt()
+        self.turn.cancel()
+        metrics.inc("barge_ins")
+
+    async def recognize(self):
+        """
+        The function `recognize` starts recognition of each segment as soon as it arrives, so several
+        can be in flight at once, and passes the pending results on in the order they were spoken.
+        """
+        while True:
+            segment = await self.segments.get()
+            if "speculation" in segment:
+                # Already recognized during the pause that ended it
+                future = segment["speculation"].transcript
+            else:
+                future = asyncio.wrap_future(recognizer_pool.submit(segment))
+            await self.transcripts.put((segment, future))
+            metrics.set_gauge("stt_queue_depth", self.transcripts.qsize())
+
+    async def converse(self):
+        """
+        The function `converse` takes transcripts in the order the segments were spoken, handles quit
+        commands and answers each one through NEXUS. A transcript already answered speculatively only
+        has to be confirmed. It returns on a quit command or an error.
+        """
+        # Restoring memory can take a while the first time, so it runs here rather than holding up the mic
+        if retain_memory:
+            await asyncio.to_thread(load_context)
+        if self.nexus is None:
+            await self.open_graph()
+
+        while True:
+            segment, future = await self.transcripts.get()
+            self.handling = True
+            metrics.trace_id.set(segment["trace_id"])
+            metrics.set_gauge("tts_queue_depth", tts.queue.qsize())
+            # Speak again after a barge-in, and start a new record of what was said
+            tts.resume()
+            self.barged_in = False
+
+            try:
+                user_input = (await future).lower()
+
+                if user_input in ["quit", "exit", "q"]:
+                    print("Exit command detected. Stopping listener.")
+                    return
+
+                speculation = segment.get("speculation")
+                if speculation is not None and speculation.task is not None:
+                    # Answered while the VAD waited out the pause; it may speak now
+                    metrics.inc("speculations_confirmed")
+                    self.turn = speculation.task
+                    speculation.confirmed.set()
+                else:
+                    if self.rollback is not None:
+                        await asyncio.gather(self.rollback, return_exceptions=True)
+                    # Its own task, so a barge-in can cancel the turn without cancelling this stage
+                    self.turn = asyncio.create_task(self.respond(user_input))
+                await self.turn
+
+            except sr.UnknownValueError:
+                # Only say "didn't catch that" if the energy level is high enough
+                # This prevents responding to background noise
+                if segment["energy"] > 0.03:  # Adjust this threshold as needed
+                    speakText("Sorry, I didn't catch that.")
+            except sr.RequestError:
+                speakText("Speech recognition failed.")
+            except Exception:
+                speakText("An error occurred.")
+                return
+            finally:
+                self.handling = False
+
+    async def respond(self, user_input: str, speculation: Speculation = None):
+        """
+        The function `respond` runs one turn, traced in LangSmith.
+
+        :param user_input: The user's message
+        :type user_input: str
+        :param speculation: The speculation the turn runs on, if it was started before the user finished
+        :type speculation: Speculation
+        """
+        await traced_turn.get()(self, user_input, speculation)
+
+    async def _respond(self, user_input: str, speculation: Speculation = None):
+        """
+        The function `_respond` processes user input, streams the Nexus response token by token, and
+        hands every complete sentence to the TTS worker as soon as it arrives. Only the final assistant
+        message is logged, after any tool-call rounds have finished and the answer has been spoken. If
+        the turn is cancelled by a barge-in, only what was said is kept. A speculative turn holds its
+        sentences and to-do changes back until the speculation is confirmed, and rolls back if it is
+        discarded instead.
+
+        :param user_input: The `user_input` parameter is a string that represents the input provided by
+        the user. This input is then processed by the function to generate a response from the coding
+        assistant
+        :type user_input: str
+        :param speculation: The speculation the turn runs on, or None
+        :type speculation: Speculation
+        """
+        from langchain_core.messages import AIMessageChunk
+
+        print("User: ", user_input)
+        if speculation is None:
+            await asyncio.to_thread(add_user_log, user_input)
+        print(f"{os.environ.get('name')}: ", end="", flush=True)
+
+        held = []
+
+        def say(sentence):
+            if speculation is not None and not speculation.confirmed.is_set():
+                held.append(sentence)
+                return
+            while held:
+                tts.say(held.pop(0))
+            tts.say(sentence)
+
+        async def release():
+            # The user's message is logged once it is certain, before the answer
+            await speculation.confirmed.wait()
+            await asyncio.to_thread(add_user_log, user_input)
+            while held:
+                tts.say(held.pop(0))
+
+        released = asyncio.create_task(release()) if speculation is not None else None
+        config = self.config
+        if speculation is not None:
+            # Checkpoints can be rolled back but the to-do list cannot, so its changes wait
+            config = {**config, "configurable": {**config["configurable"], "todo_changes": speculation.confirmed}}
+        before = None
+        started = time.perf_counter()
+        try:
+            if speculation is not None:
+                before = await self.nexus.aget_state(self.config)
+            cached = await asyncio.to_thread(response_cache.get, user_input)
+            if cached is not None:
+                # Recorded as a normal exchange, so follow-up questions still have the context
+                await self.nexus.aupdate_state(self.config, {"messages": [
+                    {"role": "user", "content": user_input},
+                    {"role": "assistant", "content": cached}
+                ]}, as_node="compact")
+                print(cached)
+                say(cached)
+                if released is not None:
+                    await asyncio.shield(released)
+                await asyncio.to_thread(add_nexus_log, cached)
+                metrics.inc("response_cache_hits")
+                metrics.observe("turn", time.perf_counter() - started)
+                return
+
+            sentences = SentenceBuffer()
+            spoken = False
+            message_id = None
+            async for chunk, metadata in self.nexus.astream(
+                    {"messages": [{"role": "user", "content": user_input}]},
+                    config=config,
+                    stream_mode="messages"):
+                if metadata.get("langgraph_node") != "chatbot" or not isinstance(chunk, AIMessageChunk):
+                    continue
+                if chunk.id != message_id:
+                    # A new model round started (e.g. after tool calls), finish the previous one first
+                    for sentence in sentences.flush():
+                        say(sentence)
+                        spoken = True
+                    message_id = chunk.id
+                text = _chunk_text(chunk)
+                print(text, end="", flush=True)
+                for sentence in sentences.feed(text):
+                    if not spoken:
+                        metrics.observe("first_sentence", time.perf_counter() - started)
+                    say(sentence)
+                    spoken = True
+
+            for sentence in sentences.flush():
+                say(sentence)
+                spoken = True
+
+            messages = (await self.nexus.aget_state(self.config)).values["messages"]
+            assistant_response = messages[-1].content
+            if not spoken:
+                # Nothing was streamed by the model, so speak the final message as a whole
+                print(assistant_response, end="")
+                say(assistant_response)
+            print()
+            metrics.observe("turn", time.perf_counter() - started)
+            if released is not None:
+                await asyncio.shield(released)
+
+            if BARGE_IN_ENABLED:
+                # The turn can still be interrupted until the answer has been spoken
+                await asyncio.to_thread(tts.wait)
+            await asyncio.to_thread(add_nexus_log, assistant_response)
+            tool_calls, failed = _tool_calls(messages)
+            if not failed:
+                await asyncio.to_thread(response_cache.put, user_input, assistant_response, tool_calls)
+        except asyncio.CancelledError:
+            if released is not None:
+                if speculation.confirmed.is_set():
+                    await released
+                else:
+                    released.cancel()
+            if speculation is not None and speculation.discarded:
+                await self._roll_back(before)
+            elif self.barged_in:
+                await self._commit_interrupted(user_input)
+            else:
+                raise
+        finally:
+            # The async checkpointer does not prune on write, so old checkpoints are dropped per turn
+            await asyncio.to_thread(graph.checkpoint_store.retain, str(self.config["configurable"]["thread_id"]))
+
+    async def _commit_interrupted(self, user_input: str):
+        """
+        The function `_commit_interrupted` records a turn the user talked over: everything the graph
+        added after the user's message is replaced by what the assistant actually said, which is also
+        what gets logged.
+
+        :param user_input: The user's message of the interrupted turn
+        :type user_input: str
+        """
+        from langchain_core.messages import AIMessage, HumanMessage, RemoveMessage
+        print(" [interrupted]")
+        metrics.inc("turns_interrupted")
+        # The utterance cut short is only recorded once the worker returns from it; `interrupt` emptied
+        # the queue, so this returns at once
+        await asyncio.to_thread(tts.wait)
+        said = tts.spoken_text()
+        messages = (await self.nexus.aget_state(self.config)).values.get("messages", [])
+        cut = len(messages)
+        while cut and messages[cut - 1].type != "human":
+            cut -= 1
+        if cut and messages[cut - 1].content == user_input:
+            update = [RemoveMessage(id=message.id) for message in messages[cut:]]
+        else:
+            # Cancelled before the graph stored the user's message
+            update = [HumanMessage(content=user_input)]
+        update.append(AIMessage(content=f"{said} [interrupted by the user]" if said else "[interrupted by the user]"))
+        await self.nexus.aupdate_state(self.config, {"messages": update}, as_node="compact")
+        if said:
+            await asyncio.to_thread(add_nexus_log, said)
+
+    async def _roll_back(self, before):
+        """
+        The function `_roll_back` undoes a discarded speculative turn by making the checkpoint taken
+        before it the latest one again, summary and recalled exchanges included.
+
+        :param before: The `StateSnapshot` from before the turn, or None if it was cancelled first
+        """
+        from langchain_core.messages import RemoveMessage
+        print(" [discarded]")
+        if before is None:
+            return
+        if before.values:
+            await self.nexus.aupdate_state(before.config, {"messages": []}, as_node="compact")
+            return
+        # The conversation was empty, so there is no checkpoint to go back to
+        messages = (await self.nexus.aget_state(self.config)).values.get("messages", [])
+        if messages:
+            await self.nexus.aupdate_state(
+                self.config, {"messages": [RemoveMessage(id=message.id) for message in messages]}, as_node="compact")
+
+
+def _tool_calls(messages: list) -> tuple:
     """
-    print("User: ", user_input)
-    add_user_log(user_input)
-    final_state = nexus.invoke(
-        {"messages": [{"role": "user", "content": user_input}]},
-        config=config)
+    The function `_tool_calls` lists the tool calls made since the latest user turn, and tells whether
+    any of them failed or timed out.
 
-    assistant_response = final_state["messages"][-1].content
-    add_nexus_log(assistant_response)
-    speakText(assistant_response)
+    :param messages: The conversation state's messages
+    :type messages: list
+    :return: A tuple `(calls, failed)`: dicts with "name" and "args", and True if a result has status
+    "error"
+    """
+    calls, failed = [], False
+    for message in reversed(messages):
+        if message.type == "human":
+            break
+        if message.type == "tool" and getattr(message, "status", None) == "error":
+            failed = True
+        if message.type == "ai":
+            calls.extend({"name": call["name"], "args": call["args"]} for call in message.tool_calls)
+    return calls, failed
 
 
 def load_context():
     """
-    The `load_context` function loads previous messages and invokes the NEXUS system with a progress
-    bar.
+    The `load_context` function prepares NEXUS memory. The recent conversation comes back with the
+    persistent checkpointer; older exchanges are recalled per turn from the long-term memory index,
+    which is built from the log once, the first time it is found empty. A thread that has no state yet
+    is seeded with the last `HISTORY_IMPORT_MESSAGES` logged messages, without calling the model.
     """
-    prior_messages = get_previous_logs()
-    progress_bar = ChargingBar(
-        f"Initializing NEXUS", max=len(prior_messages)//2)
-    for i in range(0, len(prior_messages), 2):  # user, assistant pairs
-        history_slice = prior_messages[:i+1]  # include up to current user msg
-        nexus.invoke({"messages": history_slice}, config=config)
-        progress_bar.next()
-    print("\n")
+    if memory_index.count == 0:
+        if memory_index.build(iter_logs()):
+            print(f"Indexed {memory_index.count} past exchanges into NEXUS memory.")
+    messages = get_previous_logs(limit=HISTORY_IMPORT_MESSAGES) if HISTORY_IMPORT_MESSAGES > 0 else []
+    # Start at a user turn, so the imported conversation does not open with a reply
+    while messages and messages[0]["role"] != "user":
+        messages.pop(0)
+    if messages and graph.get().import_history(config, messages):
+        print(f"Imported the last {len(messages)} logged messages into NEXUS memory.")
 
 
 def audio_callback(indata, frames, time, status):
     """Called by sounddevice for each audio chunk from mic"""
     if status:
         print(f"Sounddevice status: {status}")
-    q.put(indata.copy())
+    capture.write(indata)
 
 
-def listen_to_mic():
+def open_mic(on_write=None):
     """
-    Continuously listens to microphone input, uses Silero VAD to detect speech,
-    then runs Google speech recognition on detected speech segments,
-    and handles quit commands.
-    """
-    print("Starting mic listener...")
-    global q
-    q = Queue()
-    
-    # Track when we last processed speech to avoid rapid repeated messages
-    last_speech_time = 0
-    min_time_between_messages = 2  # seconds
-
-    with sd.InputStream(samplerate=SAMPLE_RATE, channels=CHANNELS, dtype='int16', callback=audio_callback):
-        buffer = np.zeros((0, CHANNELS), dtype='int16')
-
-        while not exit_event.is_set():
-            try:
-                # Collect audio chunks from queue
-                data = q.get(timeout=1)  # wait for max 1 sec
-
-                # Append new data to buffer
-                buffer = np.concatenate((buffer, data), axis=0)
-
-                # Convert buffer to torch tensor and normalize to float32 (-1.0 to 1.0)
-                waveform = torch.from_numpy(
-                    buffer.T.astype(np.float32) / 32768.0)
-
-                # Run VAD on the buffered audio with more aggressive parameters
-                speech_timestamps = get_speech_timestamps(
-                    waveform, 
-                    vad_model, 
-                    sampling_rate=SAMPLE_RATE,
-                    min_speech_duration_ms=250,     # Minimum speech segment duration
-                    max_speech_duration_s=float('inf'),  # No maximum duration
-                    min_silence_duration_ms=1000,   # Increased to 1000ms (1 second)
-                    speech_pad_ms=500,              # Increased padding to 500ms
-                    threshold=0.3                    # Lower threshold to be more sensitive
-                )
-
-                if speech_timestamps:
-                    # Calculate average speech probability to filter out weak detections
-                    # This helps avoid processing background noise
-                    speech_probs = []
-                    for seg in speech_timestamps:
-                        start, end = seg['start'], seg['end']
-                        # Get the segment and calculate its energy/volume
-                        segment = waveform[:, start:end]
-                        energy = torch.mean(torch.abs(segment)).item()
-                        speech_probs.append(energy)
-                    
-                    avg_speech_prob = sum(speech_probs) / len(speech_probs) if speech_probs else 0
-                    
-                    # Only process if the speech probability is high enough
-                    # and enough time has passed since the last message
-                    current_time = time.time()
-                    if avg_speech_prob > 0.01 and (current_time - last_speech_time) >= min_time_between_messages:
-                        # Wait a bit after detecting speech to capture more audio
-                        # This helps ensure we get the complete phrase
-                        try:
-                            # Try to get more audio data for up to 1.5 seconds after speech detection
-                            wait_end = time.time() + 1.5
-                            while time.time() < wait_end:
-                                try:
-                                    more_data = q.get(timeout=0.1)
-                                    buffer = np.concatenate((buffer, more_data), axis=0)
-                                except Empty:
-                                    continue
-                        except Exception:
-                            pass  # If any error occurs during waiting, just proceed with what we have
-                            
-                        # Update waveform with new buffer data
-                        waveform = torch.from_numpy(buffer.T.astype(np.float32) / 32768.0)
-                        
-                        # Recalculate speech timestamps with the new buffer
-                        speech_timestamps = get_speech_timestamps(
-                            waveform, 
-                            vad_model, 
-                            sampling_rate=SAMPLE_RATE,
-                            min_speech_duration_ms=250,
-                            max_speech_duration_s=float('inf'),
-                            min_silence_duration_ms=1000,
-                            speech_pad_ms=500,
-                            threshold=0.3
-                        )
-
-                        # Extract first detected speech segment (or loop over all)
-                        for seg in speech_timestamps:
-                            start, end = seg['start'], seg['end']
-                            speech_segment = waveform[:, start:end]
-
-                            # Convert to bytes for speech_recognition
-                            speech_np = (speech_segment.numpy().T *
-                                         32768).astype(np.int16)
-                            # 2 bytes per sample (int16)
-                            audio_data = sr.AudioData(
-                                speech_np.tobytes(), SAMPLE_RATE, 2)
-
-                            try:
-                                user_input = r.recognize_google(audio_data).lower()
-                                
-                                # Update the last speech time
-                                last_speech_time = time.time()
-
-                                if user_input in ["quit", "exit", "q"]:
-                                    exit_event.set()
-                                    print("Exit command detected. Stopping listener.")
-                                    break
-
-                                # Your existing processing here:
-                                stream_graph_updates(user_input)
-
-                            except sr.UnknownValueError:
-                                # Only say "didn't catch that" if the energy level is high enough
-                                # This prevents responding to background noise
-                                segment_energy = torch.mean(torch.abs(speech_segment)).item()
-                                if segment_energy > 0.03:  # Adjust this threshold as needed
-                                    speakText("Sorry, I didn't catch that.")
-                                    last_speech_time = time.time()
-                            except sr.RequestError:
-                                speakText("Speech recognition failed.")
-                                last_speech_time = time.time()
-                            except Exception:
-                                speakText("An error occurred.")
-                                last_speech_time = time.time()
-                                exit_event.set()
-                                break
-
-                        # Remove processed audio from buffer
-                        if speech_timestamps:
-                            buffer = buffer[speech_timestamps[-1]['end']:]
-                    else:
-                        # If speech probability is too low, just trim the buffer
-                        # but don't process it or respond
-                        if speech_timestamps:
-                            buffer = buffer[speech_timestamps[-1]['end']:]
-                else:
-                    # If no speech detected, keep buffer under control (avoid infinite growth)
-                    max_buffer_len = SAMPLE_RATE * 5  # max 5 seconds buffer
-                    if buffer.shape[0] > max_buffer_len:
-                        buffer = buffer[-max_buffer_len:]
+    The function `open_mic` opens the microphone stream that feeds `audio_callback`.
 
-            except Empty:
-                # No audio data received, continue waiting
-                continue
-            except KeyboardInterrupt:
-                print("Interrupted by user.")
-                exit_event.set()
-                break
+    :param on_write: An optional callable run from the audio thread after every block
+    :return: A `sounddevice.InputStream`, to be used as a context manager
+    """
+    global capture
+    capture = CaptureBuffer(int(SAMPLE_RATE * CAPTURE_SECONDS), on_write=on_write)
+    return sd.InputStream(samplerate=SAMPLE_RATE, channels=CHANNELS, dtype='int16',
+                          blocksize=int(SAMPLE_RATE * CHUNK_DURATION), callback=audio_callback)
+
+
+def collect_stats() -> dict:
+    if not graph.loaded:
+        return {}
+    from intents import intent_stats
+    from tools import weather_cache, news_cache
+    return {
+        "intent_hits": intent_stats["hit"],
+        "intent_misses": intent_stats["miss"],
+        "weather_cache_hits": weather_cache.stats()["hits"],
+        "weather_cache_misses": weather_cache.stats()["misses"],
+        "news_cache_hits": news_cache.stats()["hits"],
+        "news_cache_misses": news_cache.stats()["misses"],
+        **graph.checkpoint_store.stats(),
+        "memory_index_exchanges": memory_index.count
+    }
+
+
+async def amain():
+    warm_up()
+    # Every logged exchange is added to the long-term memory index as it is written
+    add_log_listener(memory_index.observe)
+    metrics.register_collector(collect_stats)
+    metrics.start_exporter(nexus_file("metrics.prom"), nexus_file("traces.jsonl"))
+
+    try:
+        await VoiceLoop(config).run()
+    finally:
+        recognizer_pool.shutdown()
+    # Let any queued speech finish before exiting
+    await asyncio.to_thread(tts.wait)
 
 
 def main():
     """
-    The main function loads user config, replays logs if specified, and runs an assistant that listens
-    to microphone and keyboard inputs.
+    The main function runs an assistant that listens to microphone and keyboard inputs until "q" is
+    pressed, a quit command is spoken or Ctrl+C.
     """
-
-    # Load and replay logs
-    if os.environ.get("retain_memory") != "False":
-        load_context()
-
-    # Run the assistant
-    mic_thread = threading.Thread(target=listen_to_mic)
-    kb_thread = threading.Thread(target=listen_to_keyboard(exit_event))
-
-    mic_thread.start()
-    kb_thread.start()
-
-    mic_thread.join()
-    kb_thread.join()
\ No newline at end of file
+    try:
+        asyncio.run(amain())
+    except KeyboardInterrupt:
+        print("Interrupted by user.")
@@ -0,0 +1,144 @@
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+
+# Every `Lazy` created so far, in creation order, for the startup profile
+components = []
+
+
+class Lazy:
+    """
+    Builds a heavy object (a model, a client, a module) once, on first use, from whichever thread asks
+    first. Attribute access is forwarded to the built object, so a `Lazy` can stand in for it.
+    """
+
+    def __init__(self, name: str, factory):
+        self.name = name
+        self.factory = factory
+        self.seconds = None  # how long the factory took, once it has run
+        self._value = None
+        self._loaded = False
+        self._lock = threading.Lock()
+        components.append(self)
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def get(self):
+        """
+        The function `get` returns the built object, building it first if needed. Concurrent callers
+        wait for a single build.
+
+        :return: The object returned by the factory
+        """
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    start = time.perf_counter()
+                    self._value = self.factory()
+                    self.seconds = time.perf_counter() - start
+                    self._loaded = True
+        return self._value
+
+    def _preload(self):
+        try:
+            self.get()
+        except Exception:
+            # The next `get()` on the thread that needs the object retries and raises there
+            pass
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.get(), name)
+
+
+def preload(*lazies):
+    """
+    The function `preload` starts building each component on its own background thread, so loads that
+    do not depend on each other overlap instead of adding up.
+
+    :param lazies: The `Lazy` components to build
+    """
+    for lazy in lazies:
+        threading.Thread(target=lazy._preload, name=f"preload-{lazy.name}", daemon=True).start()
+
+
+_import_line = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def _print_import_table(stderr: str, top: int):
+    """
+    The function `_print_import_table` summarizes `python -X importtime` output: import time per
+    top-level package (self time, so nothing is counted twice) and the slowest individual imports.
+    """
+    packages, modules = defaultdict(int), []
+    for line in stderr.splitlines():
+        match = _import_line.match(line)
+        if not match:
+            if not line.startswith("import time:"):
+                print(line, file=sys.stderr)
+            continue
+        self_us, cumulative_us, indent, module = int(match[1]), int(match[2]), match[3], match[4]
+        packages[module.split(".")[0]] += self_us
+        modules.append((cumulative_us, len(indent) // 2, module))
+
+    print(f"\nimport time by package (self, top {top})")
+    for package, us in sorted(packages.items(), key=lambda item: -item[1])[:top]:
+        print(f"  {package:40} {us / 1e6:8.3f} s")
+    print(f"\nslowest imports (cumulative, top {top})")
+    for cumulative_us, depth, module in sorted(modules, reverse=True)[:top]:
+        print(f"  {module:40} {cumulative_us / 1e6:8.3f} s  (depth {depth})")
+
+
+def profile_startup(started: float, top: int = 20):
+    """
+    The function `profile_startup` reports what starting NEXUS costs: the import time of each module,
+    the time until the mic listener could start, and the init time of every lazily built component
+    when they are all loaded in parallel. It re-runs itself under `python -X importtime` to see
+    the imports.
+
+    :param started: `time.perf_counter()` taken when `__main__` began
+    :type started: float
+    :param top: How many rows to show in each import table
+    :type top: int
+    """
+    if "importtime" not in sys._xoptions:
+        child = subprocess.run([sys.executable, "-X", "importtime", *sys.argv],
+                               stderr=subprocess.PIPE, text=True, env=os.environ.copy())
+        _print_import_table(child.stderr, top)
+        return
+
+    import run
+    imported = time.perf_counter()
+    try:
+        with run.open_mic():
+            listening = time.perf_counter()
+    except Exception as e:
+        print(f"(mic could not be opened: {e})")
+        listening = None
+
+    warm_start = time.perf_counter()
+    run.warm_up()
+    for lazy in components:
+        try:
+            lazy.get()
+        except Exception as e:
+            print(f"(could not load {lazy.name}: {e})")
+    ready = time.perf_counter()
+
+    print("startup profile")
+    print(f"  {'import run':40} {imported - started:8.3f} s")
+    if listening is not None:
+        print(f"  {'mic stream open':40} {listening - imported:8.3f} s")
+        print(f"  {'time to first listen':40} {listening - started:8.3f} s")
+    print("  components, loaded in parallel:")
+    for lazy in components:
+        seconds = f"{lazy.seconds:8.3f} s" if lazy.seconds is not None else "  failed"
+        print(f"    {lazy.name:38} {seconds}")
+    print(f"  {'all components ready':40} {ready - warm_start:8.3f} s after warm up began")
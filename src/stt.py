@@ -0,0 +1,110 @@
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import numpy as np
+import speech_recognition as sr
+
+from metrics import timer, trace_id
+
+# Backends report failures with the speech_recognition exceptions, so callers handle every backend
+# the same way: `sr.UnknownValueError` for unintelligible audio, `sr.RequestError` for service errors.
+
+
+class GoogleSTT:
+    """
+    Speech recognition through the Google Web Speech API (network round trip per utterance).
+    """
+
+    def __init__(self):
+        self.recognizer = sr.Recognizer()
+
+    def transcribe(self, audio: np.ndarray, sample_rate: int) -> str:
+        """
+        The function `transcribe` turns one speech segment into text.
+
+        :param audio: A 1-D int16 array with the speech segment
+        :type audio: np.ndarray
+        :param sample_rate: The sample rate of the audio
+        :type sample_rate: int
+        :return: The recognized text
+        """
+        # 2 bytes per sample (int16); a byte view of the segment avoids copying it
+        audio_data = sr.AudioData(memoryview(np.ascontiguousarray(audio)).cast("B"), sample_rate, 2)
+        return self.recognizer.recognize_google(audio_data)
+
+
+class WhisperSTT:
+    """
+    Local CPU speech recognition with a quantized faster-whisper model.
+    """
+
+    def __init__(self, model_size: str = "base.en", compute_type: str = "int8", workers: int = 1):
+        from faster_whisper import WhisperModel
+        self.model = WhisperModel(model_size, device="cpu", compute_type=compute_type, num_workers=workers)
+
+    def transcribe(self, audio: np.ndarray, sample_rate: int) -> str:
+        """
+        The function `transcribe` turns one speech segment into text.
+
+        :param audio: A 1-D int16 array with the speech segment, sampled at 16 kHz
+        :type audio: np.ndarray
+        :param sample_rate: The sample rate of the audio
+        :type sample_rate: int
+        :return: The recognized text
+        """
+        samples = np.multiply(audio, np.float32(1 / 32768.0), dtype=np.float32)
+        segments, _ = self.model.transcribe(samples, language="en", beam_size=1)
+        text = " ".join(segment.text.strip() for segment in segments).strip()
+        if not text:
+            raise sr.UnknownValueError()
+        return text
+
+
+def load_stt_backend():
+    """
+    The function `load_stt_backend` builds the speech-to-text backend selected by `stt_backend` in the
+    config.
+
+    :return: An object with a `transcribe(audio, sample_rate)` method
+    """
+    backend = os.environ.get("stt_backend", "google")
+    if backend == "google":
+        return GoogleSTT()
+    if backend == "whisper":
+        return WhisperSTT(
+            model_size=os.environ.get("whisper_model", "base.en"),
+            compute_type=os.environ.get("whisper_compute_type", "int8"),
+            workers=int(os.environ.get("stt_workers", 2))
+        )
+    raise ValueError(f"Unknown stt_backend '{backend}', expected 'google' or 'whisper'.")
+
+
+class RecognizerPool:
+    """
+    Runs recognition for VAD segments on a pool of worker threads, so capture and VAD keep running
+    while earlier segments are being recognized. Callers keep the returned futures in the order the
+    segments were submitted to read the transcripts in spoken order.
+    """
+
+    def __init__(self, backend, sample_rate: int, workers: int = 2):
+        self.backend = backend
+        self.sample_rate = sample_rate
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="stt")
+
+    def submit(self, segment: dict) -> Future:
+        """
+        The function `submit` schedules recognition of a speech segment.
+
+        :param segment: A segment dict from `StreamingVAD.process`
+        :type segment: dict
+        :return: A future resolving to the transcript
+        """
+        return self.executor.submit(self._transcribe, segment)
+
+    def _transcribe(self, segment: dict) -> str:
+        trace_id.set(segment.get("trace_id"))
+        with timer("stt"):
+            return self.backend.transcribe(segment["audio"], self.sample_rate)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
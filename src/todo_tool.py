@@ -1,44 +1,159 @@
 import json
 import os
+import sqlite3
+import threading
+from contextlib import contextmanager
 from langchain.tools import tool
 from typing import List, Dict
 
-NEXUS_FILES = os.environ.get("nexus_files")
-TODO_FILE = f"{NEXUS_FILES}/todo.json"
+from utils import nexus_file
 
+TODO_FILE = nexus_file("todo.json")  # legacy store, migrated into TODO_DB on first start
+TODO_DB = nexus_file("todo.sqlite")
 
-def load_todo_list() -> List[Dict]:
+# ToolNode may run several todo tools in parallel, so every access goes through one locked connection
+_lock = threading.RLock()
+_conn = sqlite3.connect(TODO_DB, check_same_thread=False, isolation_level=None)
+_conn.executescript("""
+    PRAGMA journal_mode=WAL;
+    CREATE TABLE IF NOT EXISTS todos (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        task TEXT NOT NULL,
+        done INTEGER NOT NULL DEFAULT 0,
+        created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE INDEX IF NOT EXISTS todos_done ON todos(done);
+""")
+_cache = None
+
+# Tools that change the to-do list, and all tools that touch it
+TODO_WRITE_TOOLS = frozenset(["add_item", "check_item", "delete_item", "modify_item"])
+TODO_TOOLS = TODO_WRITE_TOOLS | {"show_todo_list"}
+
+
+@contextmanager
+def _transaction():
     """
-    The function `load_todo_list` reads and returns a list of dictionaries representing a todo list from
-    a file if it exists, otherwise returns an empty list.
-    :return: A list of dictionaries representing the todo list items is being returned. If the TODO_FILE
-    exists and can be successfully loaded as JSON, the function returns the loaded data. If there is an
-    error decoding the JSON data, an empty list is returned. If the TODO_FILE does not exist, an empty
-    list is also returned.
+    The function `_transaction` runs a block inside an immediate SQLite transaction, holding the store
+    lock, and invalidates the read cache once it finishes.
     """
-    if os.path.exists(TODO_FILE):
+    global _cache
+    with _lock:
+        _conn.execute("BEGIN IMMEDIATE")
         try:
-            with open(TODO_FILE, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except json.JSONDecodeError:
-            return []
-    else:
-        with open(TODO_FILE, "w", encoding="utf-8") as f:
-            json.dump([], f, indent=2, ensure_ascii=False)
-    return []
+            yield _conn
+            _conn.execute("COMMIT")
+        except BaseException:
+            _conn.execute("ROLLBACK")
+            raise
+        finally:
+            _cache = None
+
+
+def _item_at(conn, index: int):
+    """
+    The function `_item_at` finds the item shown at a given position of the to-do list.
+
+    :param index: The zero-based position in the list
+    :type index: int
+    :return: A `(id, task, done)` row, or None if the index is out of range
+    """
+    if index < 0:
+        return None
+    return conn.execute(
+        "SELECT id, task, done FROM todos ORDER BY id LIMIT 1 OFFSET ?", (index,)
+    ).fetchone()
+
+
+def load_todo_list(done: bool = None) -> List[Dict]:
+    """
+    The function `load_todo_list` returns the to-do list as a list of dictionaries with stable "id",
+    "task" and "done" keys. Reads are served from an in-process cache that every write invalidates.
+
+    :param done: When given, only items with this status are returned (served by the status index)
+    :type done: bool
+    :return: A list of dictionaries representing the todo list items, in the order they were added.
+    """
+    global _cache
+    with _lock:
+        if done is not None:
+            rows = _conn.execute(
+                "SELECT id, task, done FROM todos WHERE done = ? ORDER BY id", (int(done),)
+            ).fetchall()
+            return [{"id": id, "task": task, "done": bool(status)} for id, task, status in rows]
+        if _cache is None:
+            rows = _conn.execute("SELECT id, task, done FROM todos ORDER BY id").fetchall()
+            _cache = [{"id": id, "task": task, "done": bool(status)} for id, task, status in rows]
+        return [dict(item) for item in _cache]
 
 
 def save_todo_list(todo_list: List[Dict]):
     """
-    The function `save_todo_list` saves a list of dictionaries representing todo items to a file in JSON
-    format.
+    The function `save_todo_list` atomically replaces the whole todo list. Items that carry an "id"
+    keep it.
 
     :param todo_list: A list of dictionaries representing a todo list. Each dictionary should contain
     information about a single task, such as the task name, description, due date, etc
     :type todo_list: List[Dict]
     """
-    with open(TODO_FILE, "w", encoding="utf-8") as f:
-        json.dump(todo_list, f, indent=2, ensure_ascii=False)
+    with _transaction() as conn:
+        conn.execute("DELETE FROM todos")
+        conn.executemany(
+            "INSERT INTO todos (id, task, done) VALUES (?, ?, ?)",
+            [(item.get("id"), item["task"], int(item.get("done", False))) for item in todo_list]
+        )
+
+
+def _migrate_json():
+    """
+    The function `_migrate_json` merges the items from the old `todo.json` file into the SQLite store,
+    then keeps the old file with a `.migrated` suffix. Items the store already holds are not added
+    again, so a migration cut short by a crash can simply run again. A file that cannot be read is
+    left in place.
+    """
+    if not os.path.exists(TODO_FILE):
+        return
+    try:
+        with open(TODO_FILE, "r", encoding="utf-8") as f:
+            items = json.load(f)
+    except json.JSONDecodeError as e:
+        print(f"Could not migrate {TODO_FILE}, leaving it in place: {e}")
+        return
+    with _transaction() as conn:
+        existing = {row[0] for row in conn.execute("SELECT task FROM todos")}
+        conn.executemany(
+            "INSERT INTO todos (task, done) VALUES (?, ?)",
+            [(item["task"], int(item.get("done", False))) for item in items if item["task"] not in existing]
+        )
+    os.replace(TODO_FILE, f"{TODO_FILE}.migrated")
+
+
+_migrate_json()
+
+
+def todo_list_enabled(config) -> bool:
+    """
+    The function `todo_list_enabled` tells whether a graph run may use the owner's to-do list. Callers
+    serving other people's conversations turn it off with `"todo_list": False` in the configurable.
+
+    :param config: The run config, or None
+    :return: True unless the configurable turns the to-do list off
+    """
+    return (config or {}).get("configurable", {}).get("todo_list", True)
+
+
+async def wait_for_todo_changes(config):
+    """
+    The function `wait_for_todo_changes` holds back a change to the to-do list until the run may make
+    it. Speculative runs, which start before the user's words are final and may be thrown away, pass an
+    `asyncio.Event` as "todo_changes" in the configurable and set it once the turn is confirmed; other
+    runs go ahead at once.
+
+    :param config: The run config, or None
+    """
+    gate = (config or {}).get("configurable", {}).get("todo_changes")
+    if gate is not None:
+        await gate.wait()
 
 
 @tool
@@ -59,9 +174,8 @@ def add_item(item: str) -> str:
             task = item["item"]
     except:
         task = item
-    todo_list = load_todo_list()
-    todo_list.append({"task": task, "done": False})
-    save_todo_list(todo_list)
+    with _transaction() as conn:
+        conn.execute("INSERT INTO todos (task) VALUES (?)", (task,))
     return f"Added: '{task}'"
 
 
@@ -79,13 +193,13 @@ def check_item(index: int) -> str:
     list, it will update the status of the item and return a message confirming the change. If the index
     is invalid, it will return a message stating "Invalid index."
     """
-    todo_list = load_todo_list()
-    if 0 <= index < len(todo_list):
-        todo_list[index]["done"] = not todo_list[index]["done"]
-        save_todo_list(todo_list)
-        status = "checked" if todo_list[index]["done"] else "unchecked"
-        return f"Marked item {index + 1} as {status}."
-    return "Invalid index."
+    with _transaction() as conn:
+        row = _item_at(conn, index)
+        if row is None:
+            return "Invalid index."
+        conn.execute("UPDATE todos SET done = ? WHERE id = ?", (int(not row[2]), row[0]))
+    status = "unchecked" if row[2] else "checked"
+    return f"Marked item {index + 1} as {status}."
 
 
 @tool
@@ -103,12 +217,12 @@ def delete_item(index: int) -> str:
     task has been deleted. If the index is invalid (less than 0 or greater than or equal to the length
     of
     """
-    todo_list = load_todo_list()
-    if 0 <= index < len(todo_list):
-        removed = todo_list.pop(index)
-        save_todo_list(todo_list)
-        return f"Deleted: '{removed['task']}'"
-    return "Invalid index."
+    with _transaction() as conn:
+        row = _item_at(conn, index)
+        if row is None:
+            return "Invalid index."
+        conn.execute("DELETE FROM todos WHERE id = ?", (row[0],))
+    return f"Deleted: '{row[1]}'"
 
 
 @tool
@@ -129,13 +243,12 @@ def modify_item(index: int, new_task: str) -> str:
     todo list, it will return a message showing the change made from the old task to the new task. If
     the index is invalid, it will return "Invalid index."
     """
-    todo_list = load_todo_list()
-    if 0 <= index < len(todo_list):
-        old = todo_list[index]["task"]
-        todo_list[index]["task"] = new_task
-        save_todo_list(todo_list)
-        return f"Changed: '{old}' → '{new_task}'"
-    return "Invalid index."
+    with _transaction() as conn:
+        row = _item_at(conn, index)
+        if row is None:
+            return "Invalid index."
+        conn.execute("UPDATE todos SET task = ? WHERE id = ?", (new_task, row[0]))
+    return f"Changed: '{row[1]}' → '{new_task}'"
 
 
 @tool
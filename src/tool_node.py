@@ -0,0 +1,137 @@
+import asyncio
+import contextvars
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from langchain_core.messages import ToolMessage
+from langchain_core.runnables.config import get_config_list
+from langchain_core.tools import BaseTool, StructuredTool
+from langgraph.prebuilt import ToolNode
+
+from metrics import inc, timer
+from todo_tool import TODO_TOOLS, TODO_WRITE_TOOLS, todo_list_enabled, wait_for_todo_changes
+
+TOOL_WORKERS = int(os.environ.get("tool_workers", 8))
+TOOL_DEADLINE = float(os.environ.get("tool_deadline", 8))
+
+# Shared by every graph run, sync or async, so a burst of tool calls cannot start an unbounded number
+# of threads or take the event loop's default executor away from the rest of the runtime
+_executor = ThreadPoolExecutor(max_workers=TOOL_WORKERS, thread_name_prefix="tool")
+
+
+def _is_async(tool: BaseTool) -> bool:
+    if isinstance(tool, StructuredTool):
+        return tool.coroutine is not None
+    return type(tool)._arun is not BaseTool._arun
+
+
+class ParallelToolNode(ToolNode):
+    """
+    A `ToolNode` that runs all tool calls of one assistant message at the same time on a bounded
+    executor, and waits for them at most `deadline` seconds. Calls that miss the deadline are
+    answered with a structured timeout result, so the model can still reply with what it has. Each
+    tool run is timed as a "tool:<name>" stage, and failed or timed-out calls are counted as
+    "tool_errors". In runs that may not use the to-do list, calls to the to-do tools are refused rather
+    than run, and in speculative runs a batch that changes the to-do list waits until the run is
+    confirmed.
+
+    A thread cannot be stopped, so a sync tool that misses the deadline keeps running in the background
+    and holds its executor slot until it returns; such calls are counted as "tool_calls_abandoned".
+    """
+
+    def __init__(self, tools, deadline: float = TOOL_DEADLINE, **kwargs):
+        super().__init__(tools, **kwargs)
+        self.deadline = deadline
+
+    def _func(self, input, config, *, store):
+        tool_calls, input_type = self._parse_input(input, store)
+        futures = [
+            # Copy the context so each call keeps the turn's trace id
+            _executor.submit(contextvars.copy_context().run, self._timed_run_one, call, input_type, call_config)
+            for call, call_config in zip(tool_calls, get_config_list(config, len(tool_calls)))
+        ]
+        done, _ = wait(futures, timeout=self.deadline)
+        outputs = []
+        for call, future in zip(tool_calls, futures):
+            if future in done:
+                outputs.append(future.result())
+            else:
+                if not future.cancel():
+                    inc("tool_calls_abandoned")
+                outputs.append(self._timeout_message(call))
+        return self._combine_tool_outputs(outputs, input_type)
+
+    async def _afunc(self, input, config, *, store):
+        tool_calls, input_type = self._parse_input(input, store)
+        if any(call["name"] in TODO_WRITE_TOOLS for call in tool_calls):
+            # A speculative run is cancelled here if its transcript changes, before anything is written
+            await wait_for_todo_changes(config)
+        tasks = [asyncio.ensure_future(self._atimed_run_one(call, input_type, config)) for call in tool_calls]
+        done, pending = await asyncio.wait(tasks, timeout=self.deadline) if tasks else (set(), set())
+        for task in pending:
+            task.cancel()
+        outputs = [task.result() if task in done else self._timeout_message(call)
+                   for call, task in zip(tool_calls, tasks)]
+        return self._combine_tool_outputs(outputs, input_type)
+
+    def _timed_run_one(self, call, input_type, config):
+        if call["name"] in TODO_TOOLS and not todo_list_enabled(config):
+            return self._refused_message(call)
+        with timer(f"tool:{call['name']}"):
+            return self._counted(self._run_one(call, input_type, config))
+
+    async def _atimed_run_one(self, call, input_type, config):
+        if call["name"] in TODO_TOOLS and not todo_list_enabled(config):
+            return self._refused_message(call)
+        tool = self.tools_by_name.get(call["name"])
+        with timer(f"tool:{call['name']}"):
+            if tool is None or _is_async(tool):
+                return self._counted(await self._arun_one(call, input_type, config))
+            # Sync tools run on the bounded executor rather than the loop's default one
+            future = _executor.submit(contextvars.copy_context().run, self._run_one, call, input_type, config)
+            try:
+                return self._counted(await asyncio.wrap_future(future))
+            except asyncio.CancelledError:
+                if not future.cancel():
+                    inc("tool_calls_abandoned")
+                raise
+
+    def _counted(self, message):
+        if isinstance(message, ToolMessage) and message.status == "error":
+            inc("tool_errors")
+        return message
+
+    def _refused_message(self, call) -> ToolMessage:
+        return ToolMessage(
+            content=json.dumps({
+                "status": "unavailable",
+                "tool": call["name"],
+                "message": "The to-do list is not available in this conversation."
+            }),
+            name=call["name"],
+            tool_call_id=call["id"],
+            status="error"
+        )
+
+    def _timeout_message(self, call) -> ToolMessage:
+        """
+        The function `_timeout_message` builds the result of a tool call that missed the deadline.
+
+        :param call: The tool call
+        :return: A `ToolMessage` with status "error" and a JSON body the model can read
+        """
+        inc("tool_timeouts")
+        inc("tool_errors")
+        return ToolMessage(
+            content=json.dumps({
+                "status": "timeout",
+                "tool": call["name"],
+                "deadline_seconds": self.deadline,
+                "message": "The tool did not answer in time. Answer without it, or say the information "
+                           "is unavailable right now."
+            }),
+            name=call["name"],
+            tool_call_id=call["id"],
+            status="error"
+        )
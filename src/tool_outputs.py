@@ -0,0 +1,116 @@
+import hashlib
+import json
+import os
+import re
+
+from langchain.tools import tool
+from langchain_core.messages import ToolMessage
+
+from utils import nexus_file
+
+# Tool results longer than this are moved out of the conversation state once the turn is over
+TOOL_OUTPUT_MAX_CHARS = int(os.environ.get("tool_output_max_chars", 600))
+_DIGEST_CHARS = 300
+_EXPAND_CHARS = 4000
+_REF_PREFIX = "tool-output:"
+# Refs name a stored file by the start of its content hash, see `store_output`
+_ref = re.compile(rf"{re.escape(_REF_PREFIX)}(?P<digest>[0-9a-f]{{20}})")
+
+
+def _path(ref: str) -> str:
+    """
+    The function `_path` returns the file a ref points to. Refs come back from the model, so anything
+    other than a ref `store_output` could have made is rejected rather than turned into a path.
+
+    :param ref: The reference to a stored result
+    :type ref: str
+    :return: The path inside the tool output store, or None if the ref is not valid
+    """
+    match = _ref.fullmatch(ref)
+    if match is None:
+        return None
+    store = os.path.realpath(nexus_file("tool_outputs"))
+    path = os.path.realpath(os.path.join(store, f"{match['digest']}.txt"))
+    return path if os.path.dirname(path) == store else None
+
+
+def store_output(content: str) -> str:
+    """
+    The function `store_output` saves a tool result under the hash of its content. Saving the same
+    result twice keeps a single copy.
+
+    :param content: The full tool result
+    :type content: str
+    :return: The reference to the stored result
+    """
+    ref = _REF_PREFIX + hashlib.sha1(content.encode("utf-8")).hexdigest()[:20]
+    path = _path(ref)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    return ref
+
+
+def digest(content: str) -> str:
+    """
+    The function `digest` shortens a tool result: search results are reduced to their titles and
+    links, anything else to its beginning.
+
+    :param content: The full tool result
+    :type content: str
+    :return: The shortened result
+    """
+    try:
+        parsed = json.loads(content)
+    except ValueError:
+        parsed = None
+    if isinstance(parsed, dict) and isinstance(parsed.get("results"), list):
+        lines = [f"- {result.get('title', '')} ({result.get('url', '')})"
+                 for result in parsed["results"] if isinstance(result, dict)]
+        text = "\n".join(lines)
+    else:
+        text = content
+    if len(text) > _DIGEST_CHARS:
+        text = text[:_DIGEST_CHARS].rsplit(" ", 1)[0] + " ..."
+    return text
+
+
+def compact_message(message):
+    """
+    The function `compact_message` replaces a large tool result with its digest and a reference,
+    keeping the message id so the replacement overwrites it in the state.
+
+    :param message: A message from the conversation state
+    :return: The compacted `ToolMessage`, or None when the message is left as it is
+    """
+    if not isinstance(message, ToolMessage) or not isinstance(message.content, str):
+        return None
+    if len(message.content) <= TOOL_OUTPUT_MAX_CHARS or message.content.startswith("[compacted"):
+        return None
+    ref = store_output(message.content)
+    return ToolMessage(
+        content=(f"[compacted {len(message.content)} chars, call expand_tool_output with ref \"{ref}\" "
+                 f"for the full result]\n{digest(message.content)}"),
+        id=message.id,
+        name=message.name,
+        tool_call_id=message.tool_call_id,
+        status=message.status
+    )
+
+
+@tool
+def expand_tool_output(ref: str, start: int = 0) -> str:
+    """Returns the full text of an earlier tool result that was compacted, given its ref
+    (e.g. "tool-output:..."). Long results come in pages; pass `start` to read further."""
+    path = _path(ref)
+    if path is None or not os.path.exists(path):
+        return f"No stored tool output with ref {ref}."
+    with open(path, "r", encoding="utf-8") as f:
+        content = f.read()
+    page = content[start:start + _EXPAND_CHARS]
+    if start + _EXPAND_CHARS < len(content):
+        page += f"\n[more: call expand_tool_output with start={start + _EXPAND_CHARS}]"
+    return page
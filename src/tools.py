@@ -1,8 +1,9 @@
 from langchain.tools import tool
 import datetime
-import requests
 import os
 
+from http_client import TTLCache, get_json
+
 from todo_tool import (
     add_item,
     check_item,
@@ -11,6 +12,35 @@ from todo_tool import (
     show_todo_list
 )
 
+# Base URLs are configurable so the tools can be pointed at a local stub server
+WEATHER_API_URL = os.environ.get("weather_api_url", "https://api.openweathermap.org/data/2.5/weather")
+NEWS_API_URL = os.environ.get("news_api_url", "https://newsapi.org/v2/everything")
+
+weather_cache = TTLCache(ttl=float(os.environ.get("weather_cache_ttl", 600)), maxsize=64)
+news_cache = TTLCache(ttl=float(os.environ.get("news_cache_ttl", 1800)), maxsize=64)
+
+
+def _cache_key(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def has_cached_result(name: str, args: dict) -> bool:
+    """
+    The function `has_cached_result` tells whether a weather or news lookup has a fresh result in its
+    cache, i.e. whether it succeeded, without counting as a cache hit or miss.
+
+    :param name: The tool name
+    :type name: str
+    :param args: The tool arguments
+    :type args: dict
+    :return: True if the tool's cache holds a result for these arguments
+    """
+    if name == "get_weather":
+        return _cache_key(args.get("city", "")) in weather_cache
+    if name == "get_news":
+        return _cache_key(args.get("topic", "")) in news_cache
+    return False
+
 
 @tool
 def get_date() -> str:
@@ -30,14 +60,18 @@ def get_weather(city: str) -> str:
     API_KEY = os.getenv("OPENWEATHER_API_KEY")
     if not API_KEY:
         return "Weather API key not found."
-    url = f"https://api.openweathermap.org/data/2.5/weather?q={city}&appid={API_KEY}&units=metric"
+    cached = weather_cache.get(_cache_key(city))
+    if cached is not None:
+        return cached
     try:
-        res = requests.get(url).json()
+        res = get_json(WEATHER_API_URL, params={"q": city, "appid": API_KEY, "units": "metric"})
         if res.get("cod") != 200:
             return f"Could not fetch weather: {res.get('message', 'Unknown error')}"
         temp = res["main"]["temp"]
         desc = res["weather"][0]["description"]
-        return f"The current temperature in {city} is {temp}°C with {desc}."
+        weather = f"The current temperature in {city} is {temp}°C with {desc}."
+        weather_cache.set(_cache_key(city), weather)
+        return weather
     except Exception as e:
         return f"Failed to fetch weather data: {str(e)}"
 
@@ -48,13 +82,17 @@ def get_news(topic: str) -> str:
     API_KEY = os.getenv("NEWSAPI_KEY")
     if not API_KEY:
         return "News API key not found."
-    url = f"https://newsapi.org/v2/everything?q={topic}&apiKey={API_KEY}"
+    cached = news_cache.get(_cache_key(topic))
+    if cached is not None:
+        return cached
     try:
-        res = requests.get(url).json()
+        res = get_json(NEWS_API_URL, params={"q": topic, "apiKey": API_KEY})
         if res["status"] != "ok":
             return "Unable to fetch news."
         headlines = [article["title"] for article in res["articles"][:3]]
-        return "Top headlines:\n" + "\n".join(headlines)
+        news = "Top headlines:\n" + "\n".join(headlines)
+        news_cache.set(_cache_key(topic), news)
+        return news
     except Exception as e:
         return f"Failed to fetch news: {str(e)}"
 
@@ -0,0 +1,251 @@
+import hashlib
+import os
+import re
+import threading
+import time
+from concurrent.futures import Future
+from queue import Empty, Queue
+
+import sounddevice as sd
+import soundfile as sf
+
+from metrics import timer
+
+# A sentence ends at terminal punctuation followed by whitespace, or at a line break
+_sentence_end = re.compile(r"(?<=[.!?])\s+|\n+")
+
+
+class SentenceBuffer:
+    """
+    Accumulates streamed text and hands back complete sentences as soon as they are available.
+    """
+
+    def __init__(self):
+        self.text = ""
+
+    def feed(self, chunk: str) -> list:
+        """
+        The function `feed` adds a chunk of streamed text and returns the sentences it completed.
+
+        :param chunk: The next piece of streamed text
+        :type chunk: str
+        :return: A list of complete sentences, possibly empty
+        """
+        self.text += chunk
+        parts = _sentence_end.split(self.text)
+        self.text = parts.pop()
+        return [part.strip() for part in parts if part.strip()]
+
+    def flush(self) -> list:
+        """
+        The function `flush` returns whatever text is left once the stream has ended.
+
+        :return: A list with the trailing sentence, or an empty list
+        """
+        rest, self.text = self.text.strip(), ""
+        return [rest] if rest else []
+
+
+class TTSWorker:
+    """
+    A long-lived background thread that owns a single pyttsx3 engine and speaks queued utterances in
+    order, so callers never wait for the engine to start or for playback to finish. Fixed phrases are
+    rendered to audio once (and cached on disk) and then played straight from memory.
+
+    Playback can be cut short with `interrupt`, and `spoken` keeps what was actually said since the last
+    `resume`, down to the word where speech was stopped.
+    """
+
+    def __init__(self, prerender=(), cache_dir: str = None):
+        self.queue = Queue()
+        self.prerender = list(prerender)
+        self.cache_dir = cache_dir
+        self.cache = {}
+        self.engine = None
+        self.busy = False
+        self.idle_since = time.monotonic()
+        self.interrupted = False
+        self.spoken = []
+        self.word_end = 0  # end of the word being spoken, as an offset into the current utterance
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def say(self, text: str):
+        """
+        The function `say` queues an utterance and returns immediately.
+
+        :param text: The text to speak. It is dropped while the worker is interrupted
+        :type text: str
+        """
+        if not self.interrupted:
+            self.queue.put(text)
+
+    def interrupt(self):
+        """
+        The function `interrupt` stops playback at the current word, drops every queued utterance and
+        ignores new ones until `resume` is called.
+        """
+        self.interrupted = True
+        renders = []
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except Empty:
+                break
+            if isinstance(item, tuple):
+                renders.append(item)
+            self.queue.task_done()
+        # Render requests are not speech, so they still run
+        for item in renders:
+            self.queue.put(item)
+        # The engine is stopped from its own word callback; cached audio can be stopped from here
+        sd.stop()
+
+    def resume(self):
+        """
+        The function `resume` accepts utterances again after `interrupt` and starts a new `spoken`
+        record, e.g. at the start of a turn.
+        """
+        self.interrupted = False
+        self.spoken = []
+
+    def spoken_text(self) -> str:
+        return " ".join(self.spoken)
+
+    def render(self, phrase: str) -> Future:
+        """
+        The function `render` asks the worker to render a phrase to audio without playing it, e.g. to
+        get a template of the assistant's name.
+
+        :param phrase: The phrase to render
+        :type phrase: str
+        :return: A future resolving to `(samples, samplerate)`
+        """
+        future = Future()
+        self.queue.put((phrase, future))
+        return future
+
+    def wait(self):
+        """
+        The function `wait` blocks until every queued utterance has been spoken.
+        """
+        self.queue.join()
+
+    def is_busy(self) -> bool:
+        return self.busy or self.queue.unfinished_tasks > 0
+
+    def spoke_since(self, since: float) -> bool:
+        """
+        The function `spoke_since` tells whether anything was playing at some point after `since`, which
+        lets the capture loop ignore segments that may contain the assistant's own voice.
+
+        :param since: A `time.monotonic()` timestamp
+        :type since: float
+        :return: True if playback was active at or after `since`
+        """
+        return self.is_busy() or self.idle_since > since
+
+    def _render(self, phrase: str):
+        """
+        The function `_render` renders a phrase to a WAV file with the engine's current voice and loads
+        it as a float32 buffer. Rendered files are reused across runs.
+
+        :param phrase: The phrase to render
+        :type phrase: str
+        :return: A tuple `(samples, samplerate)`
+        """
+        key = f"{self.engine.getProperty('voice')}|{self.engine.getProperty('rate')}|{phrase}"
+        path = os.path.join(self.cache_dir, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".wav")
+        if not os.path.exists(path):
+            self.engine.save_to_file(phrase, path)
+            self.engine.runAndWait()
+        return sf.read(path, dtype="float32")
+
+    def _run(self):
+        try:
+            import pyttsx3
+            self.engine = pyttsx3.init()
+            self.engine.connect("started-word", self._on_word)
+        except Exception as e:
+            print(f"TTS engine could not start: {e}")
+            self._drain(e)
+            return
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            for phrase in self.prerender:
+                try:
+                    self.cache[phrase] = self._render(phrase)
+                except Exception as e:
+                    print(f"TTS could not pre-render '{phrase}': {e}")
+
+        while True:
+            text = self.queue.get()
+            if isinstance(text, tuple):
+                phrase, future = text
+                try:
+                    future.set_result(self._render(phrase))
+                except Exception as e:
+                    future.set_exception(e)
+                finally:
+                    self.queue.task_done()
+                continue
+            self.busy = True
+            try:
+                with timer("tts"):
+                    spoken = self._speak(text)
+                if spoken:
+                    self.spoken.append(spoken)
+            except Exception as e:
+                print(f"TTS error: {e}")
+            finally:
+                self.busy = False
+                self.idle_since = time.monotonic()
+                self.queue.task_done()
+
+    def _drain(self, error: Exception):
+        """
+        The function `_drain` keeps consuming the queue when there is no engine, dropping utterances and
+        failing render requests, so `wait` and `render` callers never block forever.
+
+        :param error: Why the engine could not start
+        :type error: Exception
+        """
+        while True:
+            item = self.queue.get()
+            if isinstance(item, tuple):
+                item[1].set_exception(RuntimeError(f"TTS engine unavailable: {error}"))
+            self.idle_since = time.monotonic()
+            self.queue.task_done()
+
+    def _on_word(self, name, location, length):
+        self.word_end = location + length
+        if self.interrupted:
+            self.engine.stop()
+
+    def _speak(self, text: str) -> str:
+        """
+        The function `_speak` plays one utterance and returns the part of it that was heard.
+
+        :param text: The text to speak
+        :type text: str
+        :return: The whole text, or its beginning up to the current word if playback was interrupted
+        """
+        if self.interrupted:
+            return ""
+        audio = self.cache.get(text)
+        if audio is not None:
+            samples, samplerate = audio
+            started = time.monotonic()
+            sd.play(samples, samplerate)
+            sd.wait()
+            if not self.interrupted:
+                return text
+            # Cached phrases have no word timing, so cut them at the share of the audio that played
+            heard = min(1.0, (time.monotonic() - started) * samplerate / len(samples))
+            return text[:int(len(text) * heard)].rsplit(" ", 1)[0] if heard < 1.0 else text
+        self.word_end = 0
+        self.engine.say(text)
+        self.engine.runAndWait()
+        if not self.interrupted:
+            return text
+        return text[:self.word_end].strip()
@@ -1,6 +1,6 @@
+import asyncio
 import os
 import sys
-import time
 import yaml
 
 default_config_file_path = "E:\\Projects\\NEXUS Main\\NEXUS AI\\config.default.yaml"
@@ -22,54 +22,58 @@ def load_config():
             os.environ[key] = str(config[key])
 
 
-def listen_to_keyboard(exit_event):
+def nexus_file(name: str) -> str:
     """
-    The `listen_to_keyboard` function in Python allows for detecting keyboard input to listen for the
-    "q" key and set an exit event accordingly, with platform-specific implementations for Windows and
-    POSIX systems.
+    The function `nexus_file` returns the path of a file inside the configured `nexus_files` directory,
+    creating the directory if it does not exist yet.
 
-    :param exit_event: The `exit_event` parameter is a threading.Event object that is used to signal
-    when the program should exit based on keyboard input. When the "q" key is pressed, the `exit_event`
-    will be set, indicating that the program should stop listening to the keyboard input and exit
-    gracefully
-    :return: The `listen_to_keyboard` function returns a nested function `listen` that allows for
-    keyboard input detection to listen for the "q" key and set an exit event accordingly. The function
-    has platform-specific implementations for Windows and POSIX systems.
+    :param name: The file name relative to the `nexus_files` directory
+    :type name: str
+    :return: The path to the file inside the `nexus_files` directory
     """
-    def listen():
-        """
-        The `listen` function in Python allows for keyboard input detection to listen for the "q" key
-        and set an exit event accordingly, with platform-specific implementations for Windows and POSIX
-        systems.
-        """
-        try:
-            # ---------- Windows ----------
-            import msvcrt
-            while not exit_event.is_set():
-                if msvcrt.kbhit():
-                    ch = msvcrt.getch()
-                    if ch in (b"q", b"Q"):
-                        exit_event.set()
-                        break
-                time.sleep(0.05)  # tiny sleep to prevent 100% CPU
-        except ImportError:
-            # ---------- POSIX (Linux / macOS) ----------
-            import termios
-            import tty
-            import select
+    nexus_files = os.environ.get("nexus_files")
+    os.makedirs(nexus_files, exist_ok=True)
+    return os.path.join(nexus_files, name)
+
 
-            fd = sys.stdin.fileno()
-            old_attr = termios.tcgetattr(fd)
-            try:
-                tty.setcbreak(fd)                    # raw-ish mode
-                while not exit_event.is_set():
-                    # select() with a short timeout – non-blocking
-                    ready, _, _ = select.select([sys.stdin], [], [], 0.05)
-                    if ready:
-                        ch = sys.stdin.read(1)
-                        if ch.lower() == "q":
-                            exit_event.set()
-                            break
-            finally:
-                termios.tcsetattr(fd, termios.TCSADRAIN, old_attr)
-    return listen
+async def listen_to_keyboard():
+    """
+    The `listen_to_keyboard` function waits for the "q" key without blocking the event loop, with
+    platform-specific implementations for Windows and POSIX systems. It returns when "q" is pressed
+    and can be cancelled at any time, which restores the terminal.
+
+    :return: None, once "q" was pressed
+    """
+    try:
+        # ---------- Windows ----------
+        import msvcrt
+        while True:
+            while msvcrt.kbhit():
+                if msvcrt.getch() in (b"q", b"Q"):
+                    return
+            # The console has no handle the event loop can wait on
+            await asyncio.sleep(0.05)
+    except ImportError:
+        # ---------- POSIX (Linux / macOS) ----------
+        import termios
+        import tty
+
+        if not sys.stdin.isatty():
+            # Nothing to read keys from, e.g. when the input is piped
+            await asyncio.Event().wait()
+        loop = asyncio.get_running_loop()
+        pressed = asyncio.Event()
+        fd = sys.stdin.fileno()
+        old_attr = termios.tcgetattr(fd)
+
+        def on_key():
+            if sys.stdin.read(1).lower() == "q":
+                pressed.set()
+
+        try:
+            tty.setcbreak(fd)                    # raw-ish mode
+            loop.add_reader(fd, on_key)
+            await pressed.wait()
+        finally:
+            loop.remove_reader(fd)
+            termios.tcsetattr(fd, termios.TCSADRAIN, old_attr)
@@ -0,0 +1,262 @@
+import threading
+
+import numpy as np
+
+# Silero expects fixed 512-sample windows at 16 kHz
+FRAME_SIZE = 512
+
+# Settings used by the mic listener, shared with the benchmarks so both measure the same pipeline
+VAD_SETTINGS = {
+    "threshold": 0.3,                 # Lower threshold to be more sensitive
+    "min_silence_duration_ms": 1000,  # Speech ends after 1 second of silence
+    "speech_pad_ms": 500,             # Padding kept around each segment
+    "min_speech_duration_ms": 250,    # Minimum speech segment duration
+    "max_speech_duration_s": 30       # Longest utterance kept in the ring buffer
+}
+# Segments quieter than this are treated as background noise
+MIN_SEGMENT_ENERGY = 0.01
+
+
+def segment_energy(audio: np.ndarray) -> float:
+    """
+    The function `segment_energy` returns the mean absolute amplitude of an int16 segment, scaled to
+    the 0..1 range.
+
+    :param audio: A 1-D int16 array
+    :type audio: np.ndarray
+    :return: The mean absolute amplitude
+    """
+    return float(np.abs(audio, dtype=np.int32).mean()) / 32768.0 if len(audio) else 0.0
+
+
+class RingBuffer:
+    """
+    A preallocated int16 ring buffer addressed by absolute sample index, so that segments reported by
+    the VAD can be sliced back out without keeping the whole stream in memory.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.data = np.zeros(capacity, dtype=np.int16)
+        self.total = 0  # absolute number of samples written so far
+
+    def write(self, samples: np.ndarray):
+        """
+        The function `write` copies a block of int16 samples into the ring, overwriting the oldest audio.
+
+        :param samples: A 1-D int16 array of new samples
+        :type samples: np.ndarray
+        """
+        n = len(samples)
+        if n >= self.capacity:
+            self.total += n - self.capacity
+            samples = samples[-self.capacity:]
+            n = self.capacity
+        pos = self.total % self.capacity
+        first = min(n, self.capacity - pos)
+        self.data[pos:pos + first] = samples[:first]
+        self.data[:n - first] = samples[first:]
+        self.total += n
+
+    def read(self, start: int, end: int) -> np.ndarray:
+        """
+        The function `read` returns the samples between two absolute indices, clamped to what is still
+        held in the ring.
+
+        :param start: Absolute index of the first sample
+        :type start: int
+        :param end: Absolute index one past the last sample
+        :type end: int
+        :return: A 1-D int16 array with the requested samples
+        """
+        start = max(start, self.total - self.capacity, 0)
+        end = min(end, self.total)
+        length = end - start
+        if length <= 0:
+            return np.zeros(0, dtype=np.int16)
+        pos = start % self.capacity
+        if pos + length <= self.capacity:
+            return self.data[pos:pos + length].copy()
+        return np.concatenate((self.data[pos:], self.data[:pos + length - self.capacity]))
+
+
+class CaptureBuffer:
+    """
+    A preallocated int16 ring that the sounddevice callback writes blocks into and the mic listener
+    reads back as views, so no audio is copied or allocated between the two. There is a single writer
+    and a single reader and no lock: the writer fills the ring first and only then advances `written`,
+    and the reader never looks past the `written` it has seen. A view stays valid until the reader
+    hands its samples back with `release`; while the ring is full of unreleased audio, the writer drops
+    incoming blocks and counts them in `overruns` rather than overwrite views still waiting to be
+    processed. An optional `on_write` callable runs after every block, e.g. to wake an event loop.
+    """
+
+    def __init__(self, capacity: int, on_write=None):
+        self.capacity = capacity
+        self.data = np.zeros(capacity, dtype=np.int16)
+        self.written = 0  # absolute samples written by the callback
+        self.read = 0     # absolute samples handed to the reader
+        self.consumed = 0  # absolute samples the reader has released
+        self.overruns = 0
+        self.ready = threading.Event()
+        self.on_write = on_write
+
+    def write(self, block: np.ndarray):
+        """
+        The function `write` copies one block from the audio callback into the ring. It does not
+        allocate and does not block. The block is dropped if the ring has no room for it.
+
+        :param block: The callback's `indata`, int16 with shape (frames, channels); only the first
+        channel is kept
+        :type block: np.ndarray
+        """
+        n = len(block)
+        if self.written + n - self.consumed > self.capacity:
+            self.overruns += 1
+            return
+        pos = self.written % self.capacity
+        first = min(n, self.capacity - pos)
+        self.data[pos:pos + first] = block[:first, 0]
+        self.data[:n - first] = block[first:, 0]
+        self.written += n
+        self.ready.set()
+        if self.on_write is not None:
+            self.on_write()
+
+    def views(self, timeout: float = None) -> list:
+        """
+        The function `views` waits for new audio and returns it as views into the ring: one view, or
+        two when the new audio wraps around the end. Each view stays valid until it is released.
+
+        :param timeout: How long to wait for new audio, in seconds
+        :type timeout: float
+        :return: A list of 1-D int16 arrays, empty if nothing arrived in time
+        """
+        if self.read == self.written and not self.ready.wait(timeout):
+            return []
+        self.ready.clear()
+        written = self.written
+        if written == self.read:
+            return []
+        start, self.read = self.read, written
+        pos, end = start % self.capacity, start % self.capacity + written - start
+        if end <= self.capacity:
+            return [self.data[pos:end]]
+        return [self.data[pos:], self.data[:end - self.capacity]]
+
+    def release(self, count: int):
+        """
+        The function `release` hands the oldest `count` samples given out by `views` back to the writer,
+        once the reader is done with them.
+
+        :param count: The number of samples, e.g. the length of a processed view
+        :type count: int
+        """
+        self.consumed = min(self.consumed + count, self.read)
+
+    @property
+    def pending(self) -> int:
+        return self.written - self.consumed
+
+
+class StreamingVAD:
+    """
+    Frame-by-frame Silero VAD over a fixed ring buffer. Each chunk is converted to float32 into a
+    reusable work buffer and fed through a `VADIterator` as views of it, so the cost per chunk stays
+    constant no matter how long the speech runs and nothing is allocated per chunk. Completed speech
+    segments are returned as silero-style dicts with an extra "audio" key.
+    """
+
+    def __init__(self, model, sampling_rate=16000, threshold=0.5, min_silence_duration_ms=100,
+                 speech_pad_ms=30, min_speech_duration_ms=250, max_speech_duration_s=30):
+        # Imported here so that importing `vad` does not pull in torch before the mic is open
+        import torch
+        from silero_vad import VADIterator
+
+        self.to_tensor = torch.from_numpy
+        self.sampling_rate = sampling_rate
+        self.iterator = VADIterator(
+            model,
+            threshold=threshold,
+            sampling_rate=sampling_rate,
+            min_silence_duration_ms=min_silence_duration_ms,
+            speech_pad_ms=speech_pad_ms
+        )
+        self.min_speech_samples = sampling_rate * min_speech_duration_ms // 1000
+        self.max_speech_samples = int(sampling_rate * max_speech_duration_s)
+        # Room for the longest segment plus its padding on both sides
+        pad_samples = sampling_rate * speech_pad_ms // 1000
+        self.ring = RingBuffer(self.max_speech_samples + 2 * pad_samples + FRAME_SIZE)
+        self.work = np.zeros(FRAME_SIZE, dtype=np.float32)
+        self.pending = 0  # samples at the start of `work` left over from the previous chunk
+        self.processed = 0  # absolute samples fed to the iterator
+        self.offset = 0     # absolute sample where the iterator's own counter starts
+        self.speech_start = None
+
+    @property
+    def in_speech(self) -> bool:
+        return self.speech_start is not None
+
+    @property
+    def silence_start(self):
+        """
+        The absolute sample where the current pause in speech began, while the iterator waits to see
+        whether it lasts `min_silence_duration_ms`, or None while the user is talking or not in speech.
+        """
+        temp_end = getattr(self.iterator, "temp_end", 0)
+        return self.offset + temp_end if self.in_speech and temp_end else None
+
+    def reset(self):
+        """
+        The function `reset` drops any partial speech and restarts the Silero state at the current
+        stream position.
+        """
+        self.iterator.reset_states()
+        self.offset = self.processed
+        self.speech_start = None
+
+    def process(self, chunk: np.ndarray) -> list:
+        """
+        The function `process` feeds one block of int16 audio through the VAD and returns the speech
+        segments that ended inside it.
+
+        :param chunk: A 1-D int16 array of new samples from the microphone. It may be a view into a
+        `CaptureBuffer`; it is not kept after the call returns
+        :type chunk: np.ndarray
+        :return: A list of dicts with "start", "end" (absolute sample indices) and "audio" (an int16 copy
+        that stays valid)
+        """
+        self.ring.write(chunk)
+        needed = self.pending + len(chunk)
+        if needed > len(self.work):
+            work = np.zeros(needed, dtype=np.float32)
+            work[:self.pending] = self.work[:self.pending]
+            self.work = work
+        samples = self.work[:needed]
+        np.multiply(chunk, np.float32(1 / 32768.0), out=samples[self.pending:], dtype=np.float32)
+
+        segments = []
+        n_frames = len(samples) // FRAME_SIZE
+        for i in range(n_frames):
+            frame = samples[i * FRAME_SIZE:(i + 1) * FRAME_SIZE]
+            event = self.iterator(self.to_tensor(frame))
+            self.processed += FRAME_SIZE
+            if event and "start" in event:
+                self.speech_start = self.offset + event["start"]
+            elif event and "end" in event and self.speech_start is not None:
+                self._close(self.offset + event["end"], segments)
+            if self.speech_start is not None and self.processed - self.speech_start >= self.max_speech_samples:
+                # Force a cut so a single segment never outgrows the ring
+                self._close(self.processed, segments)
+                self.reset()
+
+        # Move the incomplete last frame to the front for the next chunk
+        self.pending = needed - n_frames * FRAME_SIZE
+        self.work[:self.pending] = samples[n_frames * FRAME_SIZE:]
+        return segments
+
+    def _close(self, end: int, segments: list):
+        start, self.speech_start = self.speech_start, None
+        if end - start < self.min_speech_samples:
+            return
+        segments.append({"start": start, "end": end, "audio": self.ring.read(start, end)})
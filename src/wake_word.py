@@ -0,0 +1,176 @@
+import glob
+import os
+
+import numpy as np
+import soundfile as sf
+
+WAKE_WORD_ENABLED = os.environ.get("wake_word_enabled") == "True"
+# Seconds the assistant keeps listening after the wake word, or after the last thing it heard
+WAKE_WORD_WINDOW = float(os.environ.get("wake_word_window", 8))
+# Highest average frame distance to a template (0 = identical, 1 = unrelated) that counts as a match
+WAKE_WORD_THRESHOLD = float(os.environ.get("wake_word_threshold", 0.25))
+
+_WIN = 400     # 25 ms analysis window at 16 kHz
+_HOP = 160     # 10 ms between frames
+_N_FFT = 512
+_N_MELS = 24
+# Dynamic range kept per frame (natural log of power, about 26 dB), so background noise in the bands
+# the word leaves empty does not count against a match
+_FLOOR = 6.0
+_STRIDE = 10   # frames between two searches, so matching runs every 100 ms at most
+# Added for every alignment step that stretches or squeezes time, so the best path stays near the diagonal
+_WARP_PENALTY = 0.1
+# Frames quieter than this (mean absolute amplitude, 0..1) are not worth searching
+_MIN_LEVEL = 0.005
+
+
+def _mel_filters(sample_rate: int) -> np.ndarray:
+    def mel(hz):
+        return 2595 * np.log10(1 + hz / 700)
+
+    edges = 700 * (10 ** (np.linspace(mel(60), mel(sample_rate / 2 * 0.9), _N_MELS + 2) / 2595) - 1)
+    bins = np.fft.rfftfreq(_N_FFT, 1 / sample_rate)
+    filters = np.zeros((_N_MELS, len(bins)), dtype=np.float32)
+    for i in range(_N_MELS):
+        left, center, right = edges[i:i + 3]
+        filters[i] = np.clip(np.minimum((bins - left) / (center - left), (right - bins) / (right - center)), 0, None)
+    return filters
+
+
+def features(audio: np.ndarray, filters: np.ndarray) -> np.ndarray:
+    """
+    The function `features` turns audio into one vector per 10 ms frame: the log mel spectrum, floored
+    below its peak, with its mean removed and scaled to unit length, so two frames compare by a dot
+    product whatever the loudness.
+
+    :param audio: A 1-D float32 array, at least one window long
+    :type audio: np.ndarray
+    :param filters: The mel filter bank from `_mel_filters`
+    :type filters: np.ndarray
+    :return: A float32 array of shape (frames, mels)
+    """
+    frames = np.lib.stride_tricks.sliding_window_view(audio, _WIN)[::_HOP] * np.hanning(_WIN).astype(np.float32)
+    power = np.abs(np.fft.rfft(frames, _N_FFT)) ** 2
+    logmel = np.log(power.astype(np.float32) @ filters.T + 1e-6)
+    logmel = np.maximum(logmel, logmel.max(axis=1, keepdims=True) - _FLOOR)
+    logmel -= logmel.mean(axis=1, keepdims=True)
+    norms = np.linalg.norm(logmel, axis=1, keepdims=True)
+    return logmel / np.maximum(norms, 1e-6)
+
+
+def match_cost(template: np.ndarray, recent: np.ndarray) -> np.ndarray:
+    """
+    The function `match_cost` aligns a template anywhere inside the recent frames with dynamic time
+    warping and returns, for every recent frame, the cost of the best alignment that ends there. Each
+    template frame may advance the recent frames by 0, 1 or 2 (the first and last with a penalty), so
+    rows are computed as whole vectors.
+
+    :param template: Template features of shape (m, mels)
+    :type template: np.ndarray
+    :param recent: Recent features of shape (n, mels)
+    :type recent: np.ndarray
+    :return: An array of n average frame distances
+    """
+    distance = 1.0 - template @ recent.T
+    cost = distance[0].copy()
+    for row in distance[1:]:
+        previous = cost + _WARP_PENALTY
+        previous[1:] = np.minimum(previous[1:], cost[:-1])
+        previous[2:] = np.minimum(previous[2:], cost[:-2] + _WARP_PENALTY)
+        cost = row + previous
+    return cost / len(template)
+
+
+class KeywordSpotter:
+    """
+    An on-device wake word spotter that matches the incoming audio against a few recordings of the
+    wake word. It keeps the features of the last couple of seconds, extends them with every chunk and
+    searches them only when there is sound, so it costs far less than running the VAD and speech
+    recognition on everything the microphone hears.
+    """
+
+    def __init__(self, templates: list, sample_rate: int = 16000, threshold: float = WAKE_WORD_THRESHOLD):
+        self.filters = _mel_filters(sample_rate)
+        self.templates = [features(template, self.filters) for template in templates if len(template) >= _WIN]
+        if not self.templates:
+            raise ValueError("The wake word spotter needs at least one template.")
+        self.threshold = threshold
+        # Twice the longest template, since a slow speaker stretches the word
+        self.max_frames = 2 * max(len(template) for template in self.templates)
+        self.recent = np.zeros((0, _N_MELS), dtype=np.float32)
+        self.pending = np.zeros(0, dtype=np.float32)
+        self.since_search = 0
+        self.level = 0.0
+
+    def process(self, chunk: np.ndarray) -> bool:
+        """
+        The function `process` adds one block of audio and tells whether the wake word ended in it.
+
+        :param chunk: A 1-D int16 array of new samples
+        :type chunk: np.ndarray
+        :return: True if the wake word was just spoken
+        """
+        samples = np.concatenate((self.pending, np.multiply(chunk, np.float32(1 / 32768.0), dtype=np.float32)))
+        if len(samples) < _WIN:
+            self.pending = samples
+            return False
+        new = features(samples, self.filters)
+        self.pending = samples[len(new) * _HOP:]
+        self.recent = np.concatenate((self.recent, new))[-self.max_frames:]
+        self.level = max(self.level * 0.5, float(np.abs(samples).mean()))
+        self.since_search += len(new)
+        if self.since_search < _STRIDE or self.level < _MIN_LEVEL:
+            return False
+
+        # Only alignments that end in the frames added since the last search are new
+        fresh, self.since_search = self.since_search, 0
+        for template in self.templates:
+            if len(self.recent) < len(template) // 2:
+                continue
+            if match_cost(template, self.recent)[-fresh:].min() <= self.threshold:
+                self.reset()
+                return True
+        return False
+
+    def reset(self):
+        """
+        The function `reset` forgets the recent audio, so one utterance is not detected twice.
+        """
+        self.recent = self.recent[:0]
+        self.since_search = 0
+
+
+def trim_silence(audio: np.ndarray, level: float = 0.015) -> np.ndarray:
+    loud = np.flatnonzero(np.abs(audio) > level)
+    return audio[loud[0]:loud[-1] + 1] if len(loud) else audio[:0]
+
+
+def resample(audio: np.ndarray, rate: int, target: int) -> np.ndarray:
+    if rate == target:
+        return audio
+    positions = np.arange(0, len(audio), rate / target)
+    return np.interp(positions, np.arange(len(audio)), audio).astype(np.float32)
+
+
+def load_templates(directory: str, sample_rate: int = 16000, render=None) -> list:
+    """
+    The function `load_templates` loads recordings of the wake word from a directory of WAV files. With
+    no recordings, it falls back to the wake word rendered by `render`, which works less well than the
+    user's own voice.
+
+    :param directory: Directory with one WAV file per recording
+    :type directory: str
+    :param sample_rate: The sample rate the spotter runs at
+    :type sample_rate: int
+    :param render: An optional callable returning `(samples, samplerate)` for the wake word
+    :return: A list of float32 arrays at `sample_rate`, with the silence around the word trimmed
+    """
+    recordings = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.wav"))):
+        audio, rate = sf.read(path, dtype="float32", always_2d=True)
+        recordings.append((audio.mean(axis=1), rate))
+    if not recordings and render is not None:
+        audio, rate = render()
+        recordings.append((audio if audio.ndim == 1 else audio.mean(axis=1), rate))
+    templates = [trim_silence(resample(audio, rate, sample_rate)) for audio, rate in recordings]
+    return [template for template in templates if len(template)]
@@ -0,0 +1,98 @@
+"""
+Tests for the shared HTTP session and the TTL cache, against a stub HTTP server on localhost.
+
+    python -m pytest tests
+"""
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+os.environ.setdefault("http_read_timeout", "0.5")
+os.environ.setdefault("http_max_retry_after", "0.2")
+
+from http_client import TTLCache, get_json  # noqa: E402
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    hits = {}
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        StubHandler.hits[path] = StubHandler.hits.get(path, 0) + 1
+        if path == "/slow":
+            time.sleep(1.5)
+        if path == "/limited" and StubHandler.hits[path] < 3:
+            self.send_response(429)
+            self.send_header("Retry-After", "60")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = json.dumps({"path": path, "query": self.path.partition("?")[2]}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_get_json_sends_params(server):
+    assert get_json(f"{server}/ok", params={"q": "paris"}) == {"path": "/ok", "query": "q=paris"}
+
+
+def test_retry_after_is_capped(server):
+    started = time.monotonic()
+    assert get_json(f"{server}/limited")["path"] == "/limited"
+    assert StubHandler.hits["/limited"] == 3
+    assert time.monotonic() - started < 5
+
+
+def test_read_timeout_is_not_retried(server):
+    with pytest.raises(Exception):
+        get_json(f"{server}/slow")
+    assert StubHandler.hits["/slow"] == 1
+
+
+def test_cache_hits_and_misses():
+    cache = TTLCache(ttl=60, maxsize=4)
+    assert cache.get("paris") is None
+    cache.set("paris", "sunny")
+    assert cache.get("paris") == "sunny"
+    assert cache.stats() == {"hits": 1, "misses": 1, "size": 1}
+
+
+def test_cache_expiry():
+    cache = TTLCache(ttl=0.05)
+    cache.set("paris", "sunny")
+    time.sleep(0.1)
+    assert cache.get("paris") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_cache_evicts_least_recently_used():
+    cache = TTLCache(ttl=60, maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
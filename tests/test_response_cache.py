@@ -0,0 +1,57 @@
+"""
+Tests for the response cache keys, with the cache stored in a temporary `nexus_files` directory.
+
+    python -m pytest tests
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+os.environ.setdefault("nexus_files", tempfile.mkdtemp())
+
+import response_cache  # noqa: E402
+import tools  # noqa: E402
+from http_client import TTLCache  # noqa: E402
+
+WEATHER_CALL = [{"name": "get_weather", "args": {"city": "Paris"}}]
+
+
+@pytest.fixture(autouse=True)
+def cache(monkeypatch):
+    monkeypatch.setattr(response_cache, "RESPONSE_CACHE_ENABLED", True)
+    monkeypatch.setattr(tools, "weather_cache", TTLCache(ttl=60))
+    tools.weather_cache.set("paris", "sunny, 21 degrees")
+    yield
+    response_cache.clear()
+
+
+def test_only_queries_naming_the_lookup_get_a_key():
+    assert response_cache.cache_key("what about paris?") is None
+    assert response_cache.cache_key("what's the weather in Paris") is not None
+
+
+def test_two_questions_about_the_same_city_do_not_share_an_answer():
+    weather = "what's the weather in Paris"
+    poem = "write a poem about the weather in Paris"
+    assert response_cache.cache_key(weather) != response_cache.cache_key(poem)
+
+    response_cache.put(weather, "It's sunny in Paris.", WEATHER_CALL)
+    assert response_cache.get(poem) is None
+    assert response_cache.get(weather) == "It's sunny in Paris."
+
+
+def test_same_question_with_small_wording_differences_hits():
+    response_cache.put("What's the weather in Paris?", "It's sunny in Paris.", WEATHER_CALL)
+    assert response_cache.get("what's the weather in paris please") == "It's sunny in Paris."
+
+
+def test_other_lookups_and_failed_lookups_are_not_cached():
+    query = "what's the weather in Paris"
+    response_cache.put(query, "It's sunny in Berlin.", [{"name": "get_weather", "args": {"city": "Berlin"}}])
+    assert response_cache.get(query) is None
+    tools.weather_cache = TTLCache(ttl=60)
+    response_cache.put(query, "I couldn't get the weather.", WEATHER_CALL)
+    assert response_cache.get(query) is None
@@ -0,0 +1,27 @@
+"""
+Tests for storing and expanding compacted tool outputs, in a temporary `nexus_files` directory.
+
+    python -m pytest tests
+"""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+os.environ.setdefault("nexus_files", tempfile.mkdtemp())
+
+from tool_outputs import expand_tool_output, store_output  # noqa: E402
+from utils import nexus_file  # noqa: E402
+
+
+def test_stored_output_expands():
+    ref = store_output("a long search result")
+    assert expand_tool_output.invoke({"ref": ref}) == "a long search result"
+
+
+def test_refs_outside_the_store_are_rejected():
+    secret = nexus_file("secret.txt")
+    with open(secret, "w", encoding="utf-8") as f:
+        f.write("not a tool output")
+    for ref in ["tool-output:../secret", "tool-output:../../../etc/hostname", "tool-output:", "../secret"]:
+        assert expand_tool_output.invoke({"ref": ref}).startswith("No stored tool output")